@@ -0,0 +1,101 @@
+"""
+Checks BatchGrid against Grid and compares boards per second of BatchGrid.left()
+against looping the original Grid.left() (LegacyGrid) and the current one
+
+Every direction and a mixed direction per board are played on random boards of each
+size, and the run fails if a board, score, moved flag or can_move() differs from Grid
+
+usage: python -m bench.bench_batch [boards]
+needs numpy
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+import modules.batch as batch
+import modules.grid as grid
+from bench.diff_kernel import LegacyGrid
+from bench.run import random_grid
+
+CHECK_SIZES = ((4, 4), (1, 1), (3, 5), (6, 2), (1, 5), (8, 8))
+
+def _can_move(size: tuple[int],
+              grid_list: list[list[int]]) -> bool:
+
+    grid_obj = grid.Grid(size)
+    grid_obj.grid = [row[:] for row in grid_list]
+
+    return grid_obj.can_move()
+
+def check(size: tuple[int],
+          grids: list[list[list[int]]]) -> None:
+
+    grid_obj = grid.Grid(size)
+    rng = random.Random(len(grids))
+    directions = [rng.randrange(4) for grid_list in grids]
+
+    batch_grid = batch.BatchGrid.from_grids(grids)
+    if batch_grid.can_move().tolist() != [_can_move(size, grid_list) for grid_list in grids]:
+        sys.exit(f'BatchGrid.can_move() differs from Grid on {size[0]}x{size[1]}')
+
+    for direction in batch.DIRECTIONS + (directions,):
+        batch_grid = batch.BatchGrid.from_grids(grids)
+        scores, moved = batch_grid.move(direction if type(direction) == str else np.array(direction))
+
+        expected = []
+        for dex, grid_list in enumerate(grids):
+            grid_obj.grid = [row[:] for row in grid_list]
+            name = direction if type(direction) == str else batch.DIRECTIONS[direction[dex]]
+            score, changed = grid_obj.move(name)
+            expected.append((grid_obj.grid, score, changed))
+
+        if list(zip(batch_grid.to_grids(), scores.tolist(), moved.tolist())) != expected:
+            name = direction if type(direction) == str else 'mixed'
+            sys.exit(f'BatchGrid.move({name}) differs from Grid on {size[0]}x{size[1]}')
+
+def loop_rate(grid_class: type,
+              size: tuple[int],
+              grids: list[list[list[int]]]) -> float:
+
+    grid_objs = []
+    for grid_list in grids:
+        grid_obj = grid_class(size)
+        grid_obj.grid = [row[:] for row in grid_list]
+        grid_objs.append(grid_obj)
+
+    start = time.perf_counter()
+    for grid_obj in grid_objs:
+        grid_obj.left(1)
+
+    return len(grid_objs) / (time.perf_counter() - start)
+
+def main(boards: int=20000) -> None:
+
+    rng = random.Random(0)
+    for size in CHECK_SIZES:
+        check(size, [random_grid(rng, size, rng.random(), (2, 2, 4, 8, 16)) for i in range(500)])
+    print(f'BatchGrid matches Grid on {", ".join(f"{size[0]}x{size[1]}" for size in CHECK_SIZES)}')
+
+    for size in ((4, 4), (8, 8), (6, 3)):
+        grids = [random_grid(rng, size, 2 / 3, (2, 4, 8, 16)) for i in range(boards)]
+
+        # the loops are much slower, so they only get a slice of the boards
+        loop_count = min(boards, 2000)
+        legacy_rate = loop_rate(LegacyGrid, size, grids[:loop_count])
+        grid_rate = loop_rate(grid.Grid, size, grids[:loop_count])
+
+        batch_grid = batch.BatchGrid.from_grids(grids)
+        start = time.perf_counter()
+        batch_grid.left()
+        batch_rate = boards / (time.perf_counter() - start)
+
+        print(f'{size[0]}x{size[1]}  LegacyGrid.left(): {legacy_rate:10,.0f} boards/s  '
+              f'Grid.left(): {grid_rate:10,.0f} boards/s  BatchGrid.left(): {batch_rate:12,.0f} boards/s  '
+              f'speedup: {batch_rate / legacy_rate:5.1f}x legacy {batch_rate / grid_rate:5.1f}x Grid')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
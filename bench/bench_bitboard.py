@@ -0,0 +1,84 @@
+"""
+Compares moves per second of the original Grid.left(), Grid and BitboardGrid
+moving left and the raw bitboard move table on 4x4 boards
+
+Every row is measured against LegacyGrid (the move methods before the shared kernel),
+in-place moves are timed without restoring the board through .grid/.board after each one
+
+usage: python -m bench.bench_bitboard [moves]
+"""
+
+import random
+import sys
+import time
+
+import modules.bitboard as bitboard
+import modules.grid as grid
+from bench.diff_kernel import LegacyGrid
+from bench.run import random_grid
+
+def best_time(step: object,
+              moves: int) -> float:
+    'The fastest of three runs of step(i) for i in range(moves), in seconds'
+
+    times = []
+    for run in range(3):
+        start = time.perf_counter()
+        for i in range(moves):
+            step(i)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+def copying_rate(grid_class: type,
+                 grids: list[list[list[int]]],
+                 moves: int) -> float:
+
+    grid_objs = []
+    for grid_list in grids:
+        grid_obj = grid_class((4, 4))
+        grid_obj.grid = [row[:] for row in grid_list]
+        grid_objs.append(grid_obj)
+
+    return moves / best_time(lambda i: grid_objs[i & 255].left(), moves)
+
+def in_place_rate(grid_obj: object,
+                  restore: object,
+                  moves: int) -> float:
+
+    def step(i: int) -> None:
+        restore(i & 255)
+        grid_obj.move('left')
+
+    return moves / (best_time(step, moves) - best_time(lambda i: restore(i & 255), moves))
+
+def main(moves: int=20000) -> None:
+
+    rng = random.Random(0)
+    grids = [random_grid(rng, (4, 4), 0.75, (2, 4, 8, 16, 32, 64)) for i in range(256)]
+    boards = [bitboard.to_board(grid_list) for grid_list in grids]
+
+    rates = {}
+    for grid_class in (LegacyGrid, grid.Grid, bitboard.BitboardGrid):
+        rates[f'{grid_class.__name__}.left()'] = copying_rate(grid_class, grids, moves)
+
+    grid_obj = grid.Grid((4, 4))
+    def restore_grid(dex: int) -> None:
+        grid_obj.grid = [row[:] for row in grids[dex]]
+    rates['Grid.move()'] = in_place_rate(grid_obj, restore_grid, moves)
+
+    bitboard_obj = bitboard.BitboardGrid((4, 4))
+    def restore_board(dex: int) -> None:
+        bitboard_obj.board = boards[dex]
+    rates['BitboardGrid.move()'] = in_place_rate(bitboard_obj, restore_board, moves * 10)
+
+    move_left = bitboard.move_left
+    rates['bitboard.move_left()'] = moves * 10 / best_time(lambda i: move_left(boards[i & 255]), moves * 10)
+
+    legacy_rate = rates['LegacyGrid.left()']
+    for name, rate in rates.items():
+        print(f'{name + ":":<22} {rate:12,.0f} moves/s {rate / legacy_rate:6.1f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
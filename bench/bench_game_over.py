@@ -0,0 +1,54 @@
+"""
+Compares the old game over check in Game.run (four simulated moves compared
+to the grid) against Grid.can_move() on boards with and without gaps
+
+usage: python -m bench.bench_game_over [checks]
+"""
+
+import random
+import sys
+import time
+
+import modules.grid as grid
+from bench.run import random_grid
+
+def four_move_check(grid_obj: grid.Grid) -> bool:
+
+    return not (grid_obj.up() == grid_obj.grid
+                and grid_obj.down() == grid_obj.grid
+                and grid_obj.left() == grid_obj.grid
+                and grid_obj.right() == grid_obj.grid)
+
+def time_check(check: callable,
+               grids: list[grid.Grid],
+               checks: int) -> float:
+
+    start = time.perf_counter()
+    for i in range(checks):
+        check(grids[i % len(grids)])
+
+    return (time.perf_counter() - start) / checks
+
+def main(checks: int=5000) -> None:
+
+    rng = random.Random(0)
+    for size in ((4, 4), (8, 8)):
+        for gaps in (True, False):
+            grids = []
+            for i in range(64):
+                grid_obj = grid.Grid(size)
+                if gaps:
+                    grid_obj.grid = random_grid(rng, size, 5 / 6, (2, 4, 8, 16, 32))
+                else:
+                    grid_obj.grid = random_grid(rng, size, 1.0, (2, 4, 8, 16, 32, 64, 128, 256))
+                grids.append(grid_obj)
+
+            old = time_check(four_move_check, grids, checks)
+            new = time_check(grid.Grid.can_move, grids, checks)
+            print(f'{size[0]}x{size[1]} {"with gaps" if gaps else "full     "}  '
+                  f'four moves: {old * 1e6:8.2f}us  can_move(): {new * 1e6:8.2f}us  '
+                  f'speedup: {old / new:8.1f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
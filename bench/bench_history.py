@@ -0,0 +1,176 @@
+"""
+Memory per undo entry and undo/redo latency of History against keeping a copy of
+the grid for every move, over one long random session
+
+Before that, every move of a session is undone and redone against a copy of the board
+before every move, in memory and in a ring file small enough to wrap many times
+
+usage: python -m bench.bench_history [moves] [size]
+"""
+
+import copy
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import modules.grid as grid
+from modules.grid import percentile
+from modules.history import History
+
+def play(grid_obj: grid.Grid,
+         moves: int,
+         on_move: callable) -> None:
+    'Random moves, starting a new game whenever one ends, on_move(before grid, score) after every move'
+
+    rng = random.Random(0)
+    grid_obj.rng = random.Random(0)
+    grid_obj.reset()
+    grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+
+    for i in range(moves):
+        available = grid_obj.available_moves()
+        before = [row[:] for row in grid_obj.grid]
+        if available:
+            score = grid_obj.move(rng.choice(available))[0]
+        else:
+            # a new game is one more change of the board as far as the history is concerned
+            score = 0
+            grid_obj.reset()
+        grid_obj.spawn_new_numbers(1, (2, 4), (90, 10))
+        on_move(before, score)
+
+def check_round_trip(size: tuple[int],
+                     moves: int,
+                     ring_path: str or None=None,
+                     ring_size: int=0) -> int:
+    'Fails if undo or redo gives another board or score than the saved ones, returns how many moves could be undone'
+
+    grid_obj = grid.Grid(size)
+    history = History(ring_path=ring_path, ring_size=ring_size) if ring_path else History()
+    before_grid = grid.Grid(size)
+    # the board before every move and the score the move gained
+    snapshots = []
+
+    def on_move(before: list[list[int]],
+                score: int) -> None:
+        before_grid.grid = before
+        history.record(history.cells_of(before_grid), history.cells_of(grid_obj), score)
+        snapshots.append((before, score))
+
+    play(grid_obj, moves, on_move)
+    snapshots.append(([row[:] for row in grid_obj.grid], None))
+
+    undone = 0
+    while history.can_undo:
+        undone += 1
+        before, score = snapshots[-1 - undone]
+        if history.undo(grid_obj) != score or grid_obj.grid != before:
+            sys.exit(f'undo {undone} of {moves} does not give back the board before that move')
+    if history.undo(grid_obj) is not None:
+        sys.exit('undo went past the first move it has')
+    if ring_path is None and undone != moves:
+        sys.exit(f'only {undone} of {moves} moves could be undone')
+    if ring_path is not None and undone == moves:
+        sys.exit('the ring file never wrapped, it needs to be smaller for the check')
+
+    for dex in range(moves - undone, moves):
+        if history.redo(grid_obj) != snapshots[dex][1] or grid_obj.grid != snapshots[dex + 1][0]:
+            sys.exit(f'redo of move {dex} does not give back the board after it')
+    if history.redo(grid_obj) is not None:
+        sys.exit('redo went past the last move')
+
+    history.close()
+
+    return undone
+
+def measure_history(size: tuple[int],
+                    moves: int,
+                    ring_path: str or None=None,
+                    ring_size: int=0) -> dict:
+
+    grid_obj = grid.Grid(size)
+    history = History(ring_path=ring_path, ring_size=ring_size) if ring_path else History()
+    before_grid = grid.Grid(size)
+
+    def on_move(before: list[list[int]],
+                score: int) -> None:
+        before_grid.grid = before
+        history.record(history.cells_of(before_grid), history.cells_of(grid_obj), score)
+
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    play(grid_obj, moves, on_move)
+    memory = tracemalloc.get_traced_memory()[0] - start_memory
+    tracemalloc.stop()
+
+    stats = history.stats()
+    final = grid_obj.grid
+
+    latencies = {}
+    for name, step in (('undo', history.undo), ('redo', history.redo)):
+        times = []
+        while True:
+            start = time.perf_counter()
+            score = step(grid_obj)
+            times.append(time.perf_counter() - start)
+            if score is None:
+                break
+        times.sort()
+        latencies[name] = (sum(times) / len(times), percentile(times, 99))
+
+    # undoing everything and redoing it again needs to end on the same board
+    assert grid_obj.grid == final
+
+    history.close()
+
+    return {'memory': memory, 'stats': stats, 'latencies': latencies}
+
+def measure_copies(size: tuple[int],
+                   moves: int) -> int:
+
+    grid_obj = grid.Grid(size)
+    snapshots = []
+
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    play(grid_obj, moves, lambda before, score: snapshots.append((copy.deepcopy(before), score)))
+    memory = tracemalloc.get_traced_memory()[0] - start_memory
+    tracemalloc.stop()
+
+    return memory
+
+def main(moves: int=100000,
+         size: int=4) -> None:
+
+    size = (size, size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        check_moves = min(moves, 20000)
+        check_round_trip(size, check_moves)
+        ring_size = 4096
+        undone = check_round_trip(size, check_moves, os.path.join(directory, 'check.ring'), ring_size)
+        print(f'undo/redo match the saved boards: {check_moves} moves in memory, '
+              f'the last {undone} of them in a {ring_size} byte ring file')
+
+    print(f'{moves} moves on {size[0]}x{size[1]}')
+
+    copies = measure_copies(size, moves)
+    print(f'deepcopy per move:    {copies / moves:8.1f} bytes/move')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, ring_path, ring_size in (('History in memory:', None, 0),
+                                           ('History ring file:', os.path.join(directory, 'history.ring'), 1 << 20)):
+            result = measure_history(size, moves, ring_path, ring_size)
+            stats = result['stats']
+            (undo_mean, undo_p99), (redo_mean, redo_p99) = result['latencies']['undo'], result['latencies']['redo']
+            print(f'{name:<21} {result["memory"] / moves:8.1f} bytes/move in memory, '
+                  f'{stats["bytes_per_entry"]:.1f} bytes/entry, {stats["undoable"]} undoable, '
+                  f'undo {undo_mean * 1e6:.1f}us (p99 {undo_p99 * 1e6:.1f}us), '
+                  f'redo {redo_mean * 1e6:.1f}us (p99 {redo_p99 * 1e6:.1f}us)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
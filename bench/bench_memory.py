@@ -0,0 +1,94 @@
+"""
+Bytes per board of Grid and the other board classes, and how long a copy takes
+
+usage: python -m bench.bench_memory [boards]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+import modules.bitboard as bitboard
+import modules.compact as compact
+import modules.grid as grid
+import modules.sparse as sparse
+
+SIZES = ((4, 4), (8, 8), (16, 16))
+
+def _copy_grid(grid_obj: grid.Grid) -> grid.Grid:
+
+    new = grid.Grid(grid_obj.size, grid_obj.rng)
+    new.grid = [row[:] for row in grid_obj.grid]
+
+    return new
+
+def _copy_bitboard(grid_obj: bitboard.BitboardGrid) -> bitboard.BitboardGrid:
+
+    new = bitboard.BitboardGrid(grid_obj.size, grid_obj.rng)
+    new.board = grid_obj.board
+
+    return new
+
+# name -> (board class, copy function, sizes it supports)
+BOARDS = {'Grid': (grid.Grid, _copy_grid, SIZES),
+          'CompactGrid': (compact.CompactGrid, compact.CompactGrid.copy, SIZES),
+          'SparseGrid': (sparse.SparseGrid, None, SIZES),
+          'BitboardGrid': (bitboard.BitboardGrid, _copy_bitboard, ((4, 4),))}
+
+def make_boards(cls: type,
+                size: tuple[int],
+                count: int) -> list:
+
+    # half full boards, like the middle of a game
+    boards = []
+    for i in range(count):
+        board = cls(size)
+        board.spawn_new_numbers(size[0] * size[1] // 2, (2, 4, 8, 16, 32), None)
+        boards.append(board)
+
+    return boards
+
+def bytes_per_board(cls: type,
+                    size: tuple[int],
+                    count: int) -> float:
+
+    random.seed(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    boards = make_boards(cls, size, count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del boards
+
+    return (after - before) / count
+
+def copy_time(cls: type,
+              copy: callable,
+              size: tuple[int],
+              calls: int=20000) -> float:
+
+    random.seed(0)
+    board = make_boards(cls, size, 1)[0]
+
+    start = time.perf_counter()
+    for i in range(calls):
+        copy(board)
+
+    return (time.perf_counter() - start) / calls
+
+def main(count: int=20000) -> None:
+
+    print(f'{count} half full boards per measurement')
+    print(f'{"board":<14} {"size":>7} {"bytes/board":>12} {"copy us":>9}')
+
+    for name, (cls, copy, sizes) in BOARDS.items():
+        for size in sizes:
+            memory = bytes_per_board(cls, size, count)
+            copy_us = f'{copy_time(cls, copy, size) * 1e6:.2f}' if copy is not None else '-'
+            print(f'{name:<14} {size[0]:>3}x{size[1]:<3} {memory:>12.0f} {copy_us:>9}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,40 @@
+"""
+Rollouts per second of the Monte-Carlo hint engine as workers are added
+
+usage: python -m bench.bench_montecarlo [max workers] [seconds per search]
+"""
+
+import os
+import random
+import sys
+
+import modules.grid as grid
+from modules.montecarlo import MonteCarloPlayer
+
+def main(max_workers: int=os.cpu_count() or 1,
+         seconds: float=1.0) -> None:
+
+    grid_obj = grid.Grid((4, 4), random.Random(0))
+    grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+
+    print(f'{os.cpu_count()} cores, {seconds:.1f}s searches from a new 4x4 game, no early stop')
+    print(f'{"workers":>7} {"mode":>10} {"rollouts/s":>11} {"per worker":>11} {"speedup":>8}')
+
+    single = None
+    for workers in range(1, max_workers + 1):
+        player = MonteCarloPlayer(time_budget=seconds, workers=workers, confidence=0, seed=0)
+        # the first search starts the pool, so only the second one is measured
+        player.best_move(grid_obj)
+        player.reset_stats()
+        player.best_move(grid_obj)
+        player.close()
+
+        stats = player.stats()
+        per_worker = stats['rollouts_per_second_per_worker'].values()
+        single = single or stats['rollouts_per_second']
+        print(f'{workers:>7} {stats["mode"]:>10} {stats["rollouts_per_second"]:>11.0f} '
+              f'{sum(per_worker) / len(per_worker):>11.0f} {stats["rollouts_per_second"] / single:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]), *map(float, sys.argv[2:3]))
@@ -0,0 +1,81 @@
+"""
+Frame drawing with the precomputed layout and tile cache against working
+everything out every frame (math.log per cell, positions and text strings per frame)
+
+usage: python -m bench.bench_render [frames]
+"""
+
+import curses
+import math
+import random
+import sys
+import time
+
+from bench.run import make_game, random_grid
+
+def legacy_draw_grid(game: object) -> None:
+
+    for y, row in enumerate(game._grid.grid):
+        for x, item in enumerate(row):
+            item_str = str(item) if item else game._texts['empty_tile']
+            game._renderer.addstr(game._grid_pos[1] + y * game._cell_size[1],
+                                  game._grid_pos[0] + x * game._cell_size[0],
+                                  item_str + ' ' * (game._cell_size[0] - len(item_str)),
+                                  curses.color_pair(int(min(math.log(item, game._base), 7) if item else 0)))
+
+def legacy_render_text(game: object) -> None:
+
+    game._renderer.addstr(game._grid_pos[1] + game._cell_size[1] * 3 - 1,
+                          game._grid_pos[0] + game._grid_size[0] * game._cell_size[0] + 5,
+                          f'{game._texts['score']}{game._score}')
+    game._renderer.addstr(game._grid_pos[1] + game._cell_size[1] * 2 - 1,
+                          game._grid_pos[0] + game._grid_size[0] * game._cell_size[0] + 5,
+                          f'{game._texts['highscore']}{game._save_data['highscore']}')
+    game._renderer.addstr(game._grid_pos[1] + game._cell_size[1] - 1,
+                          game._grid_pos[0] + game._grid_size[0] * game._cell_size[0] + 5,
+                          f'{game._texts['tile_highscore']}{game._save_data['tile_highscore']}')
+    game._renderer.addstr(1, game._grid_pos[0] + math.ceil((((game._grid_size[0] - 1)
+                          * game._cell_size[0] + len(game._texts['empty_tile'])) - len(game._texts['info'])) / 2),
+                          game._texts['info'])
+
+def time_frames(game: object,
+                draw_grid: callable,
+                render_text: callable,
+                frames: int) -> tuple[float]:
+    'Returns (seconds per frame for queueing the text and grid, seconds per frame in total)'
+
+    rng = random.Random(0)
+    # a move changes a few cells, so the frames switch between two grids
+    grids = (random_grid(rng, game._grid_size, 0.75), random_grid(rng, game._grid_size, 0.75))
+
+    drawing = 0.0
+    start = time.perf_counter()
+    for i in range(frames):
+        game._grid.grid = grids[i & 1]
+        draw_start = time.perf_counter()
+        render_text(game)
+        draw_grid(game)
+        drawing += time.perf_counter() - draw_start
+        game._renderer.present()
+
+    return drawing / frames, (time.perf_counter() - start) / frames
+
+def main(frames: int=20000) -> None:
+
+    # the fake window needs no terminal, but curses.color_pair and curses.doupdate do
+    curses.color_pair = lambda number: number << 8
+    curses.doupdate = lambda: None
+
+    print(f'microseconds per frame into a fake window, {frames} frames')
+    print(f'{"size":>7} {"drawing: per frame math":>24} {"precomputed":>12} '
+          f'{"whole frame: per frame math":>28} {"precomputed":>12}')
+
+    for size in ((4, 4), (8, 8), (16, 16)):
+        legacy = time_frames(make_game(size), legacy_draw_grid, legacy_render_text, frames)
+        game = make_game(size)
+        cached = time_frames(game, type(game)._draw_grid, type(game)._render_text, frames)
+        print(f'{size[0]:>3}x{size[1]:<3} {legacy[0] * 1e6:>24.2f} {cached[0] * 1e6:>12.2f} '
+              f'{legacy[1] * 1e6:>28.2f} {cached[1] * 1e6:>12.2f}')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
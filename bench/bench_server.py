@@ -0,0 +1,113 @@
+"""
+Memory per idle session and move throughput/latency of the game server on localhost
+
+usage: python -m bench.bench_server [idle sessions] [idle connections] [active clients] [seconds]
+"""
+
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from modules.server import GameServer
+
+def session_memory(count: int) -> float:
+    'Bytes per session, without a connection'
+
+    with tempfile.TemporaryDirectory() as directory:
+        game_server = GameServer(os.path.join(directory, 'save.json'))
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            game_server.new_session()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    return (after - before) / count
+
+async def _client(port: int,
+                  deadline: float,
+                  rng: random.Random) -> int:
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'new\n')
+    await reader.readline()
+
+    moves = 0
+    while time.monotonic() < deadline:
+        writer.write(f'move {rng.choice(("up", "down", "left", "right"))}\n'.encode())
+        answer = await reader.readline()
+        moves += 1
+        if answer.startswith(b'over'):
+            writer.write(b'new\n')
+            await reader.readline()
+
+    writer.write(b'quit\n')
+    writer.close()
+
+    return moves
+
+async def load(idle_connections: int,
+               active_clients: int,
+               seconds: float) -> dict:
+
+    with tempfile.TemporaryDirectory() as directory:
+        game_server = GameServer(os.path.join(directory, 'save.json'))
+        started = asyncio.Event()
+        serve = asyncio.create_task(game_server.serve(port=0, started=started))
+        await started.wait()
+
+        idle = []
+        for i in range(idle_connections):
+            reader, writer = await asyncio.open_connection('127.0.0.1', game_server.port)
+            writer.write(b'new\n')
+            await reader.readline()
+            idle.append(writer)
+
+        rng = random.Random(0)
+        deadline = time.monotonic() + seconds
+        start = time.perf_counter()
+        moves = sum(await asyncio.gather(*(_client(game_server.port, deadline, random.Random(rng.random()))
+                                           for i in range(active_clients))))
+        elapsed = time.perf_counter() - start
+
+        stats = game_server.stats()
+
+        for writer in idle:
+            writer.close()
+        serve.cancel()
+        try:
+            await serve
+        except asyncio.CancelledError:
+            pass
+
+    stats['client_moves_per_second'] = moves / elapsed
+
+    return stats
+
+def main(idle_sessions: int=50000,
+         idle_connections: int=2000,
+         active_clients: int=50,
+         seconds: float=3.0) -> None:
+
+    # every connection is a socket on both ends here
+    limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    idle_connections = min(idle_connections, (limit - active_clients * 2 - 64) // 2)
+
+    print(f'{session_memory(idle_sessions):.0f} bytes per idle session ({idle_sessions} sessions)')
+
+    stats = asyncio.run(load(idle_connections, active_clients, seconds))
+    print(f'{idle_connections} idle connections, {active_clients} clients moving for {seconds:.0f}s')
+    print(f'{stats["sessions"]} sessions, {stats["client_moves_per_second"]:.0f} moves/s '
+          f'(round trip), p50 move latency {stats["p50_latency"] * 1e6:.0f}us, '
+          f'p99 {stats["p99_latency"] * 1e6:.0f}us (server side)')
+    print(f'{stats["save"]["writes"]} save writes')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:4]), *map(float, sys.argv[4:5]))
@@ -0,0 +1,65 @@
+"""
+Scaling of Grid and SparseGrid with the board size, at a fixed number of tiles
+
+usage: python -m bench.bench_sparse [tiles]
+"""
+
+import random
+import sys
+import time
+
+import modules.grid as grid
+import modules.sparse as sparse
+
+SIZES = (16, 32, 64, 128, 256)
+
+def time_per_call(function: callable,
+                  calls: int) -> float:
+
+    start = time.perf_counter()
+    for i in range(calls):
+        function()
+
+    return (time.perf_counter() - start) / calls
+
+def make_grid(cls: type,
+              size: int,
+              tiles: int) -> object:
+
+    rng = random.Random(0)
+    grid_list = [[0] * size for y in range(size)]
+    for cell in rng.sample(range(size * size), min(tiles, size * size)):
+        grid_list[cell // size][cell % size] = rng.choice((2, 4, 8, 16))
+
+    grid_obj = cls((size, size), random.Random(0))
+    grid_obj.grid = grid_list
+
+    return grid_obj
+
+def main(tiles: int=200) -> None:
+
+    print(f'{tiles} tiles, microseconds per call')
+    print(f'{"size":>9} {"Grid spawn":>12} {"Sparse spawn":>13} {"Grid move":>12} {"Sparse move":>12}')
+
+    for size in SIZES:
+        results = []
+        for cls in (grid.Grid, sparse.SparseGrid):
+            # the bigger the board, the fewer calls the list based Grid gets
+            calls = max(5, 20000 // size) if cls is grid.Grid else 2000
+
+            grid_obj = make_grid(cls, size, tiles)
+            spawn = time_per_call(lambda: grid_obj.spawn_new_numbers(1, (2, 4), (90, 10)), calls)
+
+            grid_obj = make_grid(cls, size, tiles)
+            directions = iter(('left', 'up', 'right', 'down') * calls)
+            move = time_per_call(lambda: grid_obj.move(next(directions)), calls)
+
+            results.append((spawn, move))
+
+        (grid_spawn, grid_move), (sparse_spawn, sparse_move) = results
+        print(f'{size:>4}x{size:<4} {grid_spawn * 1e6:>12.1f} {sparse_spawn * 1e6:>13.1f} '
+              f'{grid_move * 1e6:>12.1f} {sparse_move * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
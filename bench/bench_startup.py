@@ -0,0 +1,90 @@
+"""
+Time from starting main.py to its first frame on a pseudo terminal
+
+Every launch runs in a new temporary directory with only texts.json copied in,
+so the save file, the replays and any caches are made from scratch on the first
+launch and reused by the rest (first launch and warm launches are shown apart)
+
+usage: python -m bench.bench_startup [launches] [main.py]
+"""
+
+import json
+import os
+import pty
+import select
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def launch(main_path: str,
+           directory: str,
+           marker: bytes,
+           timeout: float=10.0) -> float:
+    'Seconds from fork to the marker showing up on the terminal'
+
+    start = time.perf_counter()
+    pid, descriptor = pty.fork()
+    if not pid:
+        os.chdir(directory)
+        os.environ['TERM'] = 'xterm-256color'
+        os.execv(sys.executable, [sys.executable, main_path])
+
+    output = b''
+    elapsed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            ready = select.select([descriptor], [], [], 0.01)[0]
+            if ready:
+                try:
+                    output += os.read(descriptor, 65536)
+                except OSError:
+                    break
+                if marker in output:
+                    elapsed = time.perf_counter() - start
+                    break
+    finally:
+        # Ctrl-c, the game quits on KeyboardInterrupt
+        os.write(descriptor, b'\x03')
+        while True:
+            ready = select.select([descriptor], [], [], 1.0)[0]
+            if not ready:
+                break
+            try:
+                if not os.read(descriptor, 65536):
+                    break
+            except OSError:
+                break
+        os.waitpid(pid, 0)
+        os.close(descriptor)
+
+    if elapsed is None:
+        raise RuntimeError('the game did not draw its first frame in time.')
+
+    return elapsed
+
+def main(launches: int=10,
+         main_path: str=os.path.join(ROOT, 'main.py')) -> None:
+
+    texts_path = os.path.join(os.path.dirname(os.path.abspath(main_path)), 'texts.json')
+    with open(texts_path, 'r', encoding='UTF-8') as texts_file:
+        marker = json.load(texts_file)['info'].encode('UTF-8')
+
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copy(texts_path, directory)
+
+        first = launch(main_path, directory, marker)
+        warm = [launch(main_path, directory, marker) for i in range(launches - 1)]
+
+    print(f'launch to first frame, {launches} launches of {main_path}')
+    print(f'first: {first * 1000:.1f}ms')
+    if warm:
+        print(f'warm:  median {statistics.median(warm) * 1000:.1f}ms, min {min(warm) * 1000:.1f}ms, '
+              f'max {max(warm) * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]), *sys.argv[2:3])
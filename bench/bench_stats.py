@@ -0,0 +1,100 @@
+"""
+Throughput and memory of the stats pipeline over a generated json-lines log of random
+games, read by one process and by several, plus a set of replays played again with Grid
+
+usage: python -m bench.bench_stats [games] [workers] [replays]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import modules.grid as grid
+import modules.stats as stats
+from modules.replay import ReplayWriter
+
+def random_game(seed: int,
+                writer_path: str or None=None) -> dict:
+    'Plays random moves to the end, recording a replay to writer_path if it is set'
+
+    rng = random.Random(seed)
+    grid_obj = grid.Grid((4, 4), random.Random(seed))
+    grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+    writer = ReplayWriter(writer_path, seed, (4, 4), (2, 4), (90, 10)) if writer_path else None
+
+    score = 0
+    moves = 0
+    while True:
+        available = grid_obj.available_moves()
+        if not available:
+            break
+        direction = rng.choice(available)
+        score += grid_obj.move(direction)[0]
+        x, y, value = grid_obj.spawn_new_numbers(1, (2, 4), (90, 10))[0]
+        moves += 1
+        if writer is not None:
+            writer.record(direction, y * 4 + x, value)
+
+    if writer is not None:
+        writer.close(score)
+
+    return {'score': score, 'moves': moves, 'board': grid_obj.grid, 'seed': seed}
+
+def write_log(path: str,
+              games: int) -> None:
+
+    # a few hundred real games repeated with other seeds, playing every game would take longer than reading them
+    samples = [random_game(seed) for seed in range(min(games, 500))]
+    with open(path, 'w') as log_file:
+        for seed in range(games):
+            log_file.write(json.dumps(dict(samples[seed % len(samples)], seed=seed)) + '\n')
+
+def measure(paths: list[str],
+            workers: int) -> tuple:
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = stats.collect(paths, workers)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result.summary(), elapsed, peak
+
+def main(games: int=200000,
+         workers: int=os.cpu_count() or 1,
+         replays: int=200) -> None:
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, 'games.jsonl')
+        write_log(log_path, games)
+        size = os.path.getsize(log_path)
+        print(f'{games} games, {size / 1e6:.1f}MB of json-lines, {os.cpu_count()} cores')
+
+        results = []
+        for worker_count in sorted({1, workers}):
+            summary, elapsed, peak = measure([log_path], worker_count)
+            results.append(summary)
+            print(f'{worker_count:>2} workers: {elapsed:6.2f}s, {size / elapsed / 1e6:6.1f}MB/s, '
+                  f'{games / elapsed:8.0f} games/s, peak {peak / 1024:.0f}KiB traced in this process')
+
+        # merged shards need to count the same games as one pass over the file
+        assert all(summary == results[0] for summary in results)
+        summary = results[0]
+        print(f'score p50 {summary["score"]["p50"]:.0f} p99 {summary["score"]["p99"]:.0f}, '
+              f'highscore {summary["highscore"]}, tile highscore {summary["tile_highscore"]}')
+
+        replay_paths = [os.path.join(directory, f'{seed}.2048r') for seed in range(replays)]
+        records = [random_game(seed, path) for seed, path in zip(range(replays), replay_paths)]
+        summary, elapsed, peak = measure(replay_paths, workers)
+        moves = sum(record['moves'] for record in records)
+        print(f'{replays} replays played again: {elapsed:.2f}s, {moves / elapsed:.0f} moves/s')
+        assert summary['highscore'] == max(record['score'] for record in records)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
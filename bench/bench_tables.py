@@ -0,0 +1,103 @@
+"""
+Build time, file size and load time of the row move tables, and Grid moves per
+second with and without them, on boards from random games of every width
+
+usage: python -m bench.bench_tables [boards] [max width]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import modules.grid as grid
+import modules.tables as tables
+
+def game_boards(size: tuple[int],
+                count: int) -> list[list[list[int]]]:
+    'The boards before every move of random games, so the tiles are like the ones of real games'
+
+    rng = random.Random(0)
+    grid_obj = grid.Grid(size, random.Random(0))
+    grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+
+    boards = []
+    while len(boards) < count:
+        moves = grid_obj.available_moves()
+        if not moves:
+            grid_obj.reset()
+            grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+            continue
+        boards.append([row[:] for row in grid_obj.grid])
+        grid_obj.move(rng.choice(moves))
+        grid_obj.spawn_new_numbers(1, (2, 4), (90, 10))
+
+    return boards
+
+def moves_per_second(size: tuple[int],
+                     boards: list[list[list[int]]],
+                     directions: tuple[str]) -> float:
+
+    grid_obj = grid.Grid(size)
+    copies = [[row[:] for row in board] for board in boards for direction in directions]
+    move_grid = grid_obj._move_grid
+
+    start = time.perf_counter()
+    for board, direction in zip(copies, directions * len(boards)):
+        move_grid(board, direction)
+
+    return len(copies) / (time.perf_counter() - start)
+
+def main(boards: int=20000,
+         max_width: int=8) -> None:
+
+    print(f'{boards} boards from random games per width, moves/s without -> with tables')
+    print(f'{"width":>5} {"bits":>4} {"build":>8} {"file":>9} {"load":>8} '
+          f'{"left/right":>22} {"all directions":>22}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the grids use the tables built here instead of the ones in __pycache__/
+        tables.CACHE_DIR = directory
+
+        for width in range(3, max_width + 1):
+            bits = tables.table_bits(width)
+            table = None
+            if bits is not None:
+                # built ahead of time like python -m modules.tables build, so every width with a table has it
+                built = tables.RowTable(width, directory)
+                build = built.build_seconds
+                built.close()
+                start = time.perf_counter()
+                table = tables.get_table(width)
+                load = time.perf_counter() - start
+                size = os.path.getsize(table.path)
+
+            size_tuple = (width, width)
+            sample = game_boards(size_tuple, boards)
+            rates = []
+            for directions in (('left', 'right'), ('left', 'right', 'up', 'down')):
+                for use_tables in (False, True):
+                    grid.USE_TABLES = use_tables
+                    # the best of a few runs, the first one with tables also fills their decoded lines
+                    rates.append(max(moves_per_second(size_tuple, sample, directions) for i in range(3)))
+            grid.USE_TABLES = True
+
+            columns = [f'{width:>5}']
+            if table is None:
+                columns.append(f'{"-":>4} {"-":>8} {"-":>9} {"-":>8}')
+            else:
+                columns.append(f'{bits:>4} {build * 1e3:>6.0f}ms {size / 1024:>6.0f}KiB {load * 1e6:>6.0f}us')
+            for without, with_tables in (rates[:2], rates[2:]):
+                columns.append(f'{without:>8.0f} -> {with_tables:>8.0f} {with_tables / without:>3.1f}x')
+            print(' '.join(columns))
+
+            if table is not None:
+                # the table's memoryviews need to go before the directory can be deleted
+                table.close()
+
+        tables.CACHE_DIR = None
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,307 @@
+"""
+Differential check of the Grid move kernel, SparseGrid and CompactGrid against the original move methods
+
+Plays every direction on random grids of many sizes and fill densities, in both
+the copying mode (up/down/left/right) and the in-place mode (move), and fails if any
+grid or score differs from what the original four loops produced, if available_moves()
+or can_move() disagree with them, if the empty cells a grid keeps track of go wrong or
+if CompactGrid spawns other numbers than Grid with the same seed
+
+The grids also hold tiles the 4 bit row tables can't (32768 merging into 65536, 65536
+itself and numbers like 3 that aren't powers of 2), and a second run checks 5 cell rows
+with their table built in a temporary directory, so the rows the tables leave to the
+loop in Grid are checked as well
+
+usage: python -m bench.diff_kernel [grids per size]
+"""
+
+import copy
+import random
+import sys
+import tempfile
+
+import modules.grid as grid
+import modules.tables as tables
+from bench.run import random_grid
+from modules.compact import CompactGrid
+from modules.sparse import SparseGrid
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+# the grid classes checked against LegacyGrid
+ENGINES = (grid.Grid, SparseGrid, CompactGrid)
+# the numbers the random grids are picked from, and the engines that can hold them (CompactGrid only holds powers)
+NUMBER_SETS = (((2, 2, 4, 4, 8, 16, 32), ENGINES),
+               ((2, 4, 8, 16384, 16384, 32768, 32768, 65536), ENGINES),
+               ((2, 3, 3, 4, 6, 8, 32768, 65536), (grid.Grid, SparseGrid)))
+
+SIZES = [(length, height) for length in range(1, 9) for height in range(1, 9)] + [(16, 16), (3, 12)]
+# the sizes checked again once the 5 cell table is built
+TABLE_SIZES = [(5, height) for height in range(1, 9)] + [(4, 4)]
+
+class LegacyGrid(grid.Grid):
+    'Grid with the move methods as they were before the shared kernel'
+
+    def up(self: object,
+           return_score: int=0) -> list or tuple:
+
+        return_grid = copy.deepcopy(self._grid)
+
+        score = 0
+
+        # a grid containing the combined status of each value
+        # what I mean is that, if the number at a position is 1
+        # the tile at that position on the real grid was combined during this iteration
+        # tiles should only combine with tiles not combined during this iteration
+        combined_statuses = self._create_grid(self._size)
+
+        for x in range(self._size[0]):
+            for y in range(1, self._size[1]):
+                unchanged_value = return_grid[y][x]
+                current_y = y
+                # repeatedly checks if there is available space above
+                # moves the number if there is
+                while current_y > 0 and not return_grid[current_y - 1][x]:
+                    return_grid[current_y - 1][x] = unchanged_value
+                    return_grid[current_y][x] = 0
+                    current_y -= 1
+                # checks for combining numbers
+                if (current_y > 0 and not combined_statuses[current_y - 1][x]
+                    and unchanged_value == return_grid[current_y - 1][x]):
+
+                    return_grid[current_y - 1][x] = unchanged_value * 2
+                    combined_statuses[current_y - 1][x] = 1
+                    return_grid[current_y][x] = 0
+                    score += unchanged_value * 2
+
+        return (return_grid, score) if return_score else return_grid
+
+    def down(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return_grid =  copy.deepcopy(self._grid)
+
+        score = 0
+
+        # a grid containing the combined status of each value
+        # what I mean is that, if the number at a position is 1
+        # the tile at that position on the real grid was combined during this iteration
+        # tiles should only combine with tiles not combined during this iteration
+        combined_statuses = self._create_grid(self._size)
+
+        for x in range(self._size[0]):
+            for y in range(self._size[1] - 2, -1, -1):
+                unchanged_value = return_grid[y][x]
+                current_y = y
+                # repeatedly checks if there is available space below
+                # moves the number if there is
+                while current_y < self._size[1] - 1 and not return_grid[current_y + 1][x]:
+                    return_grid[current_y + 1][x] = unchanged_value
+                    return_grid[current_y][x] = 0
+                    current_y += 1
+                # checks for combining numbers
+
+                if (current_y < self._size[1] - 1 and not combined_statuses[current_y + 1][x]
+                    and unchanged_value == return_grid[current_y + 1][x]):
+
+                    return_grid[current_y + 1][x] = unchanged_value * 2
+                    combined_statuses[current_y + 1][x] = 1
+                    return_grid[current_y][x] = 0
+                    score += unchanged_value * 2
+
+        return (return_grid, score) if return_score else return_grid
+
+    def left(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return_grid = copy.deepcopy(self._grid)
+
+        score = 0
+
+        # a grid containing the combined status of each value
+        # what I mean is that, if the number at a position is 1
+        # the tile at that position on the real grid was combined during this iteration
+        # tiles should only combine with tiles not combined during this iteration
+        combined_statuses = self._create_grid(self._size)
+
+        for y in range(self._size[1]):
+            for x in range(1, self._size[0]):
+                unchanged_value = return_grid[y][x]
+                current_x = x
+                # repeatedly checks if there is available space above
+                # moves the number if there is
+                while current_x > 0 and not return_grid[y][current_x - 1]:
+                    return_grid[y][current_x - 1] = unchanged_value
+                    return_grid[y][current_x] = 0
+                    current_x -= 1
+                # checks for combining numbers
+                if (current_x > 0 and not combined_statuses[y][current_x - 1]
+                    and unchanged_value == return_grid[y][current_x - 1]):
+
+                    return_grid[y][current_x - 1] = unchanged_value * 2
+                    combined_statuses[y][current_x - 1] = 1
+                    return_grid[y][current_x] = 0
+                    score += unchanged_value * 2
+
+        return (return_grid, score) if return_score else return_grid
+
+    def right(self: object,
+              return_score: int=0) -> list or tuple:
+
+        return_grid = copy.deepcopy(self._grid)
+
+        score = 0
+
+        # a grid containing the combined status of each value
+        # what I mean is that, if the number at a position is 1
+        # the tile at that position on the real grid was combined during this iteration
+        # tiles should only combine with tiles not combined during this iteration
+        combined_statuses = self._create_grid(self._size)
+
+        for y in range(self._size[1]):
+            for x in range(self._size[0] - 2, -1, -1):
+                unchanged_value = return_grid[y][x]
+                current_x = x
+                # repeatedly checks if there is available space below
+                # moves the number if there is
+                while current_x < self._size[0] - 1 and not return_grid[y][current_x + 1]:
+                    return_grid[y][current_x + 1] = unchanged_value
+                    return_grid[y][current_x] = 0
+                    current_x += 1
+
+                # checks for combining numbers
+                if (current_x < self._size[0] - 1 and not combined_statuses[y][current_x + 1]
+                    and unchanged_value == return_grid[y][current_x + 1]):
+
+                    return_grid[y][current_x + 1] = unchanged_value * 2
+                    combined_statuses[y][current_x + 1] = 1
+                    return_grid[y][current_x] = 0
+                    score += unchanged_value * 2
+
+        return (return_grid, score) if return_score else return_grid
+
+def bookkeeping_ok(grid_obj: object) -> bool:
+    'Whether the empty cells a grid keeps track of are the empty cells of its grid'
+
+    empty = [y * grid_obj.size[0] + x for y, row in enumerate(grid_obj.grid)
+             for x, item in enumerate(row) if not item]
+
+    if isinstance(grid_obj, SparseGrid):
+        free_dex = grid_obj._free_dex
+        return (sorted(grid_obj._free) == empty
+                and all(free_dex[cell] == dex for dex, cell in enumerate(grid_obj._free))
+                and all(free_dex[cell] == -1 for cell in grid_obj.tiles))
+
+    return grid_obj._empty_count == len(empty)
+
+def check_grid(grid_obj: object,
+               grid_list: list[list[int]],
+               expected: dict[str, tuple]) -> str or None:
+    """
+    Plays every direction on grid_list with grid_obj
+
+    params:
+        expected: direction -> (grid, score) from LegacyGrid
+
+    returns what differs, None if nothing does
+    """
+
+    name = type(grid_obj).__name__
+    movable = tuple(direction for direction in DIRECTIONS if expected[direction][0] != grid_list)
+
+    grid_obj.grid = copy.deepcopy(grid_list)
+    if grid_obj.available_moves() != movable or grid_obj.can_move() != bool(movable):
+        return (f'{name} available moves {grid_obj.available_moves()} (can move {grid_obj.can_move()}) '
+                f'!= {movable} on {grid_list}')
+
+    for direction in DIRECTIONS:
+        grid_obj.grid = copy.deepcopy(grid_list)
+        copied = getattr(grid_obj, direction)(1)
+        if copied != expected[direction] or grid_obj.grid != grid_list:
+            return f'{name} copying {direction} differs on {grid_list}: {copied} != {expected[direction]}'
+
+        score, moved = grid_obj.move(direction)
+        if (grid_obj.grid, score) != expected[direction] or moved != (direction in movable):
+            return (f'{name} in-place {direction} differs on {grid_list}: '
+                    f'{(grid_obj.grid, score, moved)} != {expected[direction]}')
+        if not bookkeeping_ok(grid_obj):
+            return f'{name} in-place {direction} lost track of the empty cells on {grid_list}'
+
+        grid_obj.spawn_new_numbers(2, (2, 4), (90, 10))
+        if not bookkeeping_ok(grid_obj):
+            return f'{name} lost track of the empty cells spawning after {direction} on {grid_list}'
+
+    return None
+
+def check_spawns(size: tuple[int],
+                 grid_list: list[list[int]],
+                 seed: int) -> str or None:
+    'Returns what differs if CompactGrid does not spawn the same numbers in the same cells as Grid for seed'
+
+    spawned = []
+    for grid_class in (grid.Grid, CompactGrid):
+        grid_obj = grid_class(size, random.Random(seed))
+        grid_obj.grid = copy.deepcopy(grid_list)
+        spawned.append((grid_obj.spawn_new_numbers(3, (2, 4), (90, 10)), grid_obj.grid))
+
+    if spawned[0] != spawned[1]:
+        return f'CompactGrid spawns {spawned[1]} instead of {spawned[0]} on {grid_list} with seed {seed}'
+
+    return None
+
+def check_sizes(rng: random.Random,
+                sizes: list[tuple[int]],
+                grids_per_size: int) -> int:
+    'Exits with what differs on the first grid that does, returns the number of moves checked'
+
+    checked = 0
+
+    for size in sizes:
+        legacy = LegacyGrid(size)
+        for numbers, engines in NUMBER_SETS:
+            # new grids, so they look up the row table of CACHE_DIR
+            grid_objs = [engine(size, random.Random(0)) for engine in engines]
+            for i in range(grids_per_size):
+                grid_list = random_grid(rng, size, rng.random(), numbers)
+                legacy.grid = grid_list
+                expected = {direction: getattr(legacy, direction)(1) for direction in DIRECTIONS}
+
+                for grid_obj in grid_objs:
+                    error = check_grid(grid_obj, grid_list, expected)
+                    if error is not None:
+                        sys.exit(error)
+
+                if CompactGrid in engines:
+                    error = check_spawns(size, grid_list, i)
+                    if error is not None:
+                        sys.exit(error)
+
+                checked += 4
+
+    return checked
+
+def main(grids_per_size: int=300) -> None:
+
+    rng = random.Random(0)
+    checked = check_sizes(rng, SIZES, grids_per_size)
+
+    # the 5 cell table is only used once it is built, so build one that only this run uses
+    with tempfile.TemporaryDirectory() as directory:
+        tables.RowTable(5, directory).close()
+        tables.CACHE_DIR = directory
+        try:
+            if tables.get_table(5) is None:
+                sys.exit(f'the 5 cell table built in {directory} was not found')
+            checked += check_sizes(rng, TABLE_SIZES, grids_per_size)
+        finally:
+            # the memory maps need closing before the directory can be removed
+            for length in (4, 5):
+                table = tables.get_table(length)
+                if table is not None:
+                    table.close()
+            tables.CACHE_DIR = None
+
+    print(f'{checked} moves on {len(SIZES)} sizes (and {len(TABLE_SIZES)} with the 5 cell table) '
+          f'match the original implementation in {", ".join(engine.__name__ for engine in ENGINES)}')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
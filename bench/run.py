@@ -0,0 +1,282 @@
+"""
+Benchmark suite for the hot paths, with JSON output and regression checks
+
+usage: python -m bench.run [--filter TEXT] [--output results.json]
+                           [--save-baseline bench/baseline.json]
+                           [--compare bench/baseline.json] [--threshold 0.2]
+
+Every benchmark reports operations per second (higher is better). With --compare,
+the run fails (exit code 1) when a benchmark is slower than the baseline by more
+than the threshold (0.2 means 20% fewer operations per second)
+
+Timings only compare on the same machine, so no baseline is kept in the repository:
+save one with --save-baseline before a change and --compare against it after
+"""
+
+import argparse
+import curses
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import modules.grid as grid
+import modules.sim as sim
+
+SIZES = ((4, 4), (8, 8), (12, 12), (16, 16))
+DENSITIES = (0.25, 0.5, 0.9, 1.0)
+DIRECTIONS = ('up', 'down', 'left', 'right')
+NUMBERS = (2, 4, 8, 16, 32, 64, 128)
+
+class FakeWindow(object):
+    'Stands in for a curses window, counting what would be drawn'
+
+    def __init__(self: object) -> None:
+
+        self.addstr_calls = 0
+
+    def addstr(self: object,
+               *args) -> None:
+
+        self.addstr_calls += 1
+
+    def erase(self: object) -> None:
+        pass
+
+    def noutrefresh(self: object) -> None:
+        pass
+
+    def refresh(self: object) -> None:
+        pass
+
+def random_grid(rng: random.Random,
+                size: tuple[int],
+                density: float,
+                numbers: tuple[int]=NUMBERS) -> list[list[int]]:
+    'A grid with about density of its cells filled, with numbers picked from numbers (shared by the bench scripts)'
+
+    return [[rng.choice(numbers) if rng.random() < density else 0
+             for x in range(size[0])] for y in range(size[1])]
+
+def measure(function: callable,
+            min_time: float,
+            repeats: int=3) -> float:
+    """
+    Calls function(count) in a loop until it takes at least min_time
+
+    returns the best operations per second over the repeats
+    """
+
+    count = 1
+    while True:
+        start = time.perf_counter()
+        function(count)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        count *= 10
+
+    count = max(1, int(count * min_time / max(elapsed, 1e-9)))
+
+    best = 0.0
+    for i in range(repeats):
+        start = time.perf_counter()
+        function(count)
+        elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed if elapsed else float('inf'))
+
+    return best
+
+def _bench_move(size: tuple[int],
+                density: float,
+                direction: str) -> callable:
+
+    grid_obj = grid.Grid(size)
+    grid_obj.grid = random_grid(random.Random(0), size, density)
+    move = getattr(grid_obj, direction)
+
+    def run(count: int) -> None:
+        for i in range(count):
+            move(1)
+
+    return run
+
+def _bench_spawn(size: tuple[int],
+                 density: float) -> callable:
+
+    grid_obj = grid.Grid(size)
+    template = random_grid(random.Random(0), size, density)
+
+    def run(count: int) -> None:
+        for i in range(count):
+            # a fresh copy every time so the grid stays at the same density, set through .grid
+            # so the grid counts its empty cells itself (which is part of the time)
+            grid_obj.grid = [row[:] for row in template]
+            grid_obj.spawn_new_numbers(1, (2, 4), (90, 10))
+
+    return run
+
+def _bench_game_over(size: tuple[int],
+                     density: float) -> callable:
+
+    grid_obj = grid.Grid(size)
+    grid_obj.grid = random_grid(random.Random(0), size, density)
+
+    def run(count: int) -> None:
+        for i in range(count):
+            grid_obj.can_move()
+
+    return run
+
+# where the games of make_game() keep their save.json, deleted when the process exits
+_save_directory = None
+
+def make_game(size: tuple[int]) -> object:
+    """
+    A main.Game made like the game makes it, drawing into a FakeWindow (shared by the bench scripts)
+
+    Its highscores go to a temporary save.json, curses.color_pair needs to be replaced
+    first when there is no terminal (see main())
+
+    params:
+        size: the grid size
+    """
+
+    global _save_directory
+    import main
+
+    if _save_directory is None:
+        _save_directory = tempfile.TemporaryDirectory()
+
+    game = main.Game(grid_size=size, save_path=os.path.join(_save_directory.name, 'save.json'))
+    game.set_window(FakeWindow())
+
+    return game
+
+def _bench_draw_grid(size: tuple[int],
+                     density: float) -> callable:
+
+    game = make_game(size)
+    rng = random.Random(0)
+    # alternating between two grids means every frame has something to redraw
+    grids = (random_grid(rng, size, density), random_grid(rng, size, density))
+
+    def run(count: int) -> None:
+        for i in range(count):
+            game._grid.grid = grids[i & 1]
+            game._draw_grid()
+            game._renderer.present()
+
+    return run
+
+def _bench_headless_game(size: tuple[int],
+                         engine: str) -> callable:
+
+    grid_obj = sim.ENGINES[engine](size)
+    random.seed(0)
+
+    def run(count: int) -> None:
+        for i in range(count):
+            sim.play_game(grid_obj, sim.random_policy)
+
+    return run
+
+def get_benchmarks() -> dict:
+    'name -> function that makes the benchmark function'
+
+    benchmarks = {}
+    for size in SIZES:
+        size_name = f'{size[0]}x{size[1]}'
+        for density in DENSITIES:
+            for direction in DIRECTIONS:
+                benchmarks[f'grid.{direction}[{size_name},{density}]'] = (
+                    lambda size=size, density=density, direction=direction: _bench_move(size, density, direction))
+            # a full grid has nowhere to spawn
+            if density < 1:
+                benchmarks[f'grid.spawn_new_numbers[{size_name},{density}]'] = (
+                    lambda size=size, density=density: _bench_spawn(size, density))
+            benchmarks[f'game_over[{size_name},{density}]'] = (
+                lambda size=size, density=density: _bench_game_over(size, density))
+            benchmarks[f'draw_grid[{size_name},{density}]'] = (
+                lambda size=size, density=density: _bench_draw_grid(size, density))
+
+    # random games on 8x8 and up last for tens of thousands of moves, too long to measure repeatedly
+    for size in ((4, 4), (6, 6)):
+        benchmarks[f'headless_game[{size[0]}x{size[1]},grid]'] = lambda size=size: _bench_headless_game(size, 'grid')
+    benchmarks['headless_game[4x4,bitboard]'] = lambda: _bench_headless_game((4, 4), 'bitboard')
+
+    return benchmarks
+
+def compare(results: dict,
+            baseline: dict,
+            threshold: float) -> list[str]:
+    'Returns a line for every benchmark that regressed'
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['ops_per_second']
+        new = result['ops_per_second']
+        if new < old * (1 - threshold):
+            regressions.append(f'{name}: {new:,.1f} ops/s is {1 - new / old:.0%} slower than {old:,.1f} ops/s')
+
+    return regressions
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m bench.run', description='Benchmarks the hot paths.')
+    parser.add_argument('--filter', default='', help='only run benchmarks with this in their name')
+    parser.add_argument('--min-time', type=float, default=0.1, help='seconds per measurement')
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--save-baseline', help='write the results as the baseline to this file')
+    parser.add_argument('--compare', help='baseline file to check the results against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    # drawing needs curses.color_pair and curses.doupdate, which need a real terminal
+    curses.color_pair = lambda number: number << 8
+    curses.doupdate = lambda: None
+
+    results = {}
+    for name, make in get_benchmarks().items():
+        if args.filter not in name:
+            continue
+        ops_per_second = measure(make(), args.min_time)
+        results[name] = {'ops_per_second': ops_per_second,
+                         'seconds_per_op': 1 / ops_per_second}
+        print(f'{name:<45} {ops_per_second:>16,.1f} ops/s')
+
+    report = {'python': sys.version,
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results}
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='UTF-8') as output_file:
+                json.dump(report, output_file, indent=4)
+
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='UTF-8') as baseline_file:
+                baseline = json.load(baseline_file)['results']
+        except FileNotFoundError:
+            sys.exit(f'{args.compare} does not exist yet, save a baseline with --save-baseline {args.compare} first.')
+
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:')
+            for line in regressions:
+                print(f' - {line}')
+            sys.exit(1)
+
+        print(f'\nno regressions beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
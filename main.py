@@ -1,251 +1,445 @@
+import os
+import copy
 import math
-import json
+import argparse
+import time
+import random
 import curses 
 import modules.grid as grid
-from modules.utils import addstr_robust
+from modules.render import Renderer
+from modules.save import SaveStore
+from modules.texts import load_texts
+from modules.history import History
+from modules.profiling import Profiler
+from modules.replay import ReplayWriter
 
 # 120 characters per line max no exceptions
 class Game(object):
     
-    def __init__(self: object) -> None:
+    def __init__(self: object,
+                 profiler: Profiler or None=None,
+                 history_path: str or None=None,
+                 grid_size: tuple[int]=grid.DEFAULT_SIZE,
+                 save_path: str='save.json') -> None:
+
+        # curses is only started in run(), see _init_curses()
+        self._stdscr = None
+
+        self._base = 2
+        self._spawn_choices = tuple(self._base**i for i in range(1, 3))
+        self._spawn_rates = (90, 10)
+        self._winning_power = 11
+
+        self._grid_size = grid_size
+        self._grid_pos = (13, 4)
+        self._cell_size = (8, 3)
+
+        self._grid = grid.Grid(self._grid_size)
+
+        # every game is recorded to replays/, see modules/replay.py
+        # (until a move is undone, replays can only hold moves)
+        self._replay = None
+
+        # undo and redo, kept in memory or in a ring file at history_path for very long games
+        self._history = History(self._base, ring_path=history_path)
+
+        self._renderer = None
+        # cell width -> item -> (padded string, colour attribute), filled in as new tiles show up
+        self._tile_caches = {}
+        self._tile_cache = {}
+        # the colour attribute of every tile exponent up to 7, filled in by _init_curses()
+        self._colour_pairs = ()
+        # text name -> (value, string), the last string drawn for every text with a value
+        self._text_cache = {}
+        # every position drawing needs, see _compute_layout()
+        self._layout = {}
+        
+        self._score = 0
+
+        # dead = 0
+        # playing = 1
+        # won the game (on select screen) = 2
+        # endless mode = 3
+        self._game_state = 1
+
+        # the expectimax player is made the first time a hint or autoplay is asked for
+        self._player = None
+        # the Monte-Carlo player for <m> hints, with its worker pool
+        self._montecarlo_player = None
+        self._hint = None
+        self._autoplay = 0
+
+        # timings of the game loop, does nothing unless --profile was given
+        self._profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self._profiler.count_calls(copy, 'deepcopy', 'deepcopy')
+
+        # writes save.json in the background, at most once a second
+        self._save_store = SaveStore(save_path, {'highscore': 0,
+                                                 'tile_highscore': self._spawn_choices[0]})
+        self._save_data = self._save_store.data
+
+        # checked once and then cached until texts.json changes, see modules/texts.py
+        self._texts = load_texts('texts.json')
+
+    def _init_curses(self: object) -> None:
 
         # Note: I put try/except statements after .addstr() because
         # when you resize to small, it will do raise an error
-        
+
         self._stdscr = curses.initscr()
+        self._stdscr.keypad(1)
+        curses.noecho()
+        curses.cbreak()
+        curses.curs_set(0)
+        curses.start_color()
+        curses.use_default_colors()
 
-        try:
-            self._stdscr.keypad(1)
-            curses.noecho()
-            curses.cbreak()
-            curses.curs_set(0)
-            curses.start_color()
-            curses.use_default_colors()
-
-            for i in range(curses.COLORS):
-                curses.init_pair(i, i, -1);
-            
-            self._base = 2
-            self._spawn_choices = tuple(self._base**i for i in range(1, 3))
-            self._spawn_rates = (90, 10)
-            self._winning_power = 11
-
-            self._grid_size = (4, 4)
-            self._grid_pos = (13, 4)
-            self._cell_size = (8, 3)
-
-            self._grid = grid.Grid(self._grid_size)
-            
-            self._score = 0
-
-            # dead = 0
-            # playing = 1
-            # won the game (on select screen) = 2
-            # endless mode = 3
-            self._game_state = 1
+        # tiles only use the colour pairs 0 to 7, see _get_tile()
+        for i in range(min(8, curses.COLORS)):
+            curses.init_pair(i, i, -1);
 
-            self._save_data = {'highscore': 0,
-                               'tile_highscore': self._spawn_choices[0]}
-
-            try:
-                with open('save.json', 'r', encoding='UTF-8') as save_file:
-                    self._save_data = json.load(save_file)
-            except FileNotFoundError:
-                self._save_save_data_to_file()
-
-            with open('texts.json', 'r', encoding='UTF-8') as texts_file:
-                self._texts = json.load(texts_file)
-            
-            types = {'win': list,
-                     'empty_tile': str,
-                     'score': str,
-                     'highscore': str,
-                     'tile_highscore': str,
-                     'death': str,
-                     'info': str,
-                     'stats': str}
-
-            # type checking for texts.json
-            for key, value in self._texts.items():
-                value_type = type(value)
-                if value_type != types[key]:
-                    if types[key] == list:
-                        raise ValueError(f'value for "{key}" in text.json should ' \
-                                         f'be a list of str lines, not {types[key]}')
-                    else:
-                        raise ValueError(f'value for "{key}" in text.json should ' \
-                                         f'be of type {types[key]}, not {value_type}')
+        self.set_window(self._stdscr)
 
-        finally:
-            curses.endwin()
+    def set_window(self: object,
+                   window: curses.window) -> None:
+        'Draws into window from now on (run() gives it the terminal, the benchmarks a stand-in)'
 
-    def _save_save_data_to_file(self: object) -> None:
-        'Saves the player\'s save data to the data/save/save.json file'
+        self._colour_pairs = tuple(curses.color_pair(i) for i in range(8))
+        self._renderer = Renderer(window)
+        self._compute_layout()
 
-        with open('save.json', 'w', encoding='UTF-8') as save_file:
-            json.dump(self._save_data, save_file)
+    def _compute_layout(self: object) -> None:
+        'Works out every position drawing needs, called again whenever the grid or the terminal changes size'
+
+        grid_x, grid_y = self._grid_pos
+        cell_length, cell_height = self._cell_size
+        length, height = self._grid_size
+
+        side_x = grid_x + length * cell_length + 5
+        below_y = grid_y + height * cell_height
+        # the centering is around the first dot and last dot
+        center_length = (length - 1) * cell_length + len(self._texts['empty_tile'])
+
+        self._layout = {'cells': tuple(tuple((grid_y + y * cell_height, grid_x + x * cell_length)
+                                             for x in range(length)) for y in range(height)),
+                        'tile_highscore': (grid_y + cell_height - 1, side_x),
+                        'highscore': (grid_y + cell_height * 2 - 1, side_x),
+                        'score': (grid_y + cell_height * 3 - 1, side_x),
+                        'hint': (grid_y + cell_height * 4 - 1, side_x),
+                        'info': (1, grid_x + math.ceil((center_length - len(self._texts['info'])) / 2)),
+                        'death': (below_y + 1, grid_x + math.ceil((center_length - len(self._texts['death'])) / 2)),
+                        'win': tuple((below_y + dex + 1, grid_x + math.ceil((center_length - len(string)) / 2))
+                                     for dex, string in enumerate(self._texts['win']))}
+
+        # the padded tile strings depend on the cell width
+        self._tile_cache = self._tile_caches.setdefault(cell_length, {})
+
+    def _get_tile(self: object,
+                  item: int) -> tuple[str, int]:
+
+        tile = self._tile_cache.get(item)
+        if tile is None:
+            # the exponent picks the colour, worked out once per tile without float math
+            exponent = 0
+            number = item
+            while number >= self._base:
+                number //= self._base
+                exponent += 1
+
+            item_str = str(item) if item else self._texts['empty_tile']
+            # the padding is to clear the numbers that were there before
+            tile = (item_str + ' ' * (self._cell_size[0] - len(item_str)),
+                    self._colour_pairs[min(exponent, 7)])
+            self._tile_cache[item] = tile
+
+        return tile
 
     def _draw_grid(self: object) -> None:
 
-        for y, row in enumerate(self._grid.grid):
-            for x, item in enumerate(row):
-                item_str = str(item)
-                try:
-                    self._stdscr.addstr(self._grid_pos[1] + y * self._cell_size[1],
-                                        self._grid_pos[0] + x * self._cell_size[0],
+        tile_cache = self._tile_cache
+        addstr = self._renderer.addstr
+
+        for row, positions in zip(self._grid.grid, self._layout['cells']):
+            for item, (y, x) in zip(row, positions):
+                tile = tile_cache.get(item)
+                if tile is None:
+                    tile = self._get_tile(item)
+                addstr(y, x, tile[0], tile[1])
+
+    def _get_text(self: object,
+                  name: str,
+                  value: object) -> str:
+        'The text called name followed by value, only built again when value changes'
+
+        cached = self._text_cache.get(name)
+        if cached is None or cached[0] != value:
+            cached = self._text_cache[name] = (value, f'{self._texts[name]}{value}')
+
+        return cached[1]
+
+    def _get_player(self: object) -> object:
+
+        if self._player is None:
+            # modules.ai builds its move tables on import, which would slow down every launch
+            import modules.ai as ai
+            self._player = ai.ExpectimaxPlayer(depth=3, time_budget=0.05,
+                                               spawn_choices=self._spawn_choices,
+                                               spawn_rates=self._spawn_rates)
+
+        return self._player
+
+    def _get_montecarlo_player(self: object) -> object:
+
+        if self._montecarlo_player is None:
+            import modules.montecarlo as montecarlo
+            self._montecarlo_player = montecarlo.MonteCarloPlayer(time_budget=0.25,
+                                                                  spawn_choices=self._spawn_choices,
+                                                                  spawn_rates=self._spawn_rates)
+
+        return self._montecarlo_player
+
+    def _get_hint(self: object,
+                  player: object) -> str or None:
+
+        # the expectimax player only plays 4x4 grids with tiles up to 2**15, anything else gets no hint
+        try:
+            return player.best_move(self._grid.grid)
+        except ValueError:
+            return None
+
+    def _set_autoplay(self: object,
+                      value: int) -> None:
 
-                                        # the * (self._cell_size[0] - 1) is to clear numbers 
-                                        item_str + ' ' * (self._cell_size[0] - len(item_str))
-                                        if item else self._texts['empty_tile'] + ' ' * 
-                                          (self._cell_size[0] - len(self._texts['empty_tile'])),
+        self._autoplay = value
+        # getkey() stops waiting for a key while autoplay is on
+        self._stdscr.timeout(0 if value else -1)
 
-                                        curses.color_pair(
-                                            int(min(math.log(item, self._base), 7) if item else 0)))
-                except curses.error:
-                    pass
+    def _get_autoplay_key(self: object) -> str:
+
+        move = self._get_hint(self._get_player()) if self._game_state in (1, 3) else None
+        if move is None:
+            self._set_autoplay(0)
+            return ''
+
+        return {'up': 'KEY_UP', 'down': 'KEY_DOWN', 'left': 'KEY_LEFT', 'right': 'KEY_RIGHT'}[move]
 
     def _handle_key_input(self: object,
                           key: str) -> None:
 
-        original_grid = self._grid.grid
+        if key == 'n' and self._game_state in (1, 3):
+            self._hint = self._get_hint(self._get_player())
+            return
+        elif key == 'm' and self._game_state in (1, 3):
+            self._hint = self._get_montecarlo_player().best_move(self._grid.grid)
+            return
+        elif key == 'p':
+            self._set_autoplay(not self._autoplay)
+            return
+
+        self._hint = None
+
+        if key == 'u' or key in ('U', '\x12'):
+            self._undo_redo(key == 'u')
+            return
 
         if self._game_state == 1 or self._game_state == 3:
+            direction = None
             if key in ('w', 'k', 'KEY_UP'):
-                return_value = self._grid.up(1)
-                self._grid.grid = return_value[0]
-                self._score += return_value[1]
-                if self._grid.grid != original_grid:
-                    self._grid.spawn_new_numbers(1, self._spawn_choices, self._spawn_rates)
-
+                direction = 'up'
             elif key in ('s', 'j', 'KEY_DOWN'):
-                return_value = self._grid.down(1)
-                self._grid.grid = return_value[0]
-                self._score += return_value[1]
-                if self._grid.grid != original_grid:
-                    self._grid.spawn_new_numbers(1, self._spawn_choices, self._spawn_rates)
-
+                direction = 'down'
             elif key in ('a', 'h', 'KEY_LEFT'):
-                return_value = self._grid.left(1)
-                self._grid.grid = return_value[0]
-                self._score += return_value[1]
-                if self._grid.grid != original_grid:
-                    self._grid.spawn_new_numbers(1, self._spawn_choices, self._spawn_rates)
-
+                direction = 'left'
             elif key in ('d', 'l', 'KEY_RIGHT'):
-                return_value = self._grid.right(1)
-                self._grid.grid = return_value[0]
-                self._score += return_value[1]
-                if self._grid.grid != original_grid:
-                    self._grid.spawn_new_numbers(1, self._spawn_choices, self._spawn_rates)
-        
+                direction = 'right'
+
+            if direction is not None:
+                before = self._history.cells_of(self._grid)
+                score, moved = self._grid.move(direction)
+                self._score += score
+                if moved:
+                    self._spawn_after_move(direction)
+                    self._history.record(before, self._history.cells_of(self._grid), score)
+
         elif self._game_state and key == 'c':
             self._game_state = 3
 
         if key == 'r':
             self._reset()
 
+    def _undo_redo(self: object,
+                   undo: bool) -> None:
+
+        if not (self._history.can_undo if undo else self._history.can_redo):
+            return
+
+        # the replay ends with the moves played so far, it has no way to hold an undo
+        if self._replay is not None:
+            self._replay.close(self._score)
+            self._replay = None
+
+        if undo:
+            self._score -= self._history.undo(self._grid)
+        else:
+            self._score += self._history.redo(self._grid)
+
+        # dead or on the win screen, the game over and win checks in run() decide again
+        if self._game_state in (0, 2):
+            self._game_state = 1
+
+    def _spawn_after_move(self: object,
+                          direction: str) -> None:
+
+        x, y, item = self._grid.spawn_new_numbers(1, self._spawn_choices, self._spawn_rates)[0]
+        if self._replay is not None:
+            self._replay.record(direction, y * self._grid_size[0] + x, item)
+
+    def _start_replay(self: object) -> None:
+
+        if self._replay is not None:
+            self._replay.close(self._score)
+
+        # the grid spawns from its own seeded generator so the replay can play the game again
+        seed = random.getrandbits(64)
+        self._grid.rng = random.Random(seed)
+
+        os.makedirs('replays', exist_ok=True)
+        self._replay = ReplayWriter(os.path.join('replays', f'{time.strftime('%Y%m%d-%H%M%S')}-{seed:016x}.2048r'),
+                                    seed, self._grid_size, self._spawn_choices, self._spawn_rates)
+
     def _reset(self: object) -> None:
 
+        self._start_replay()
+
         self._grid.reset()
         self._grid.spawn_new_numbers(2, self._spawn_choices, self._spawn_rates)
+        self._history.clear()
         
         self._score = 0
         self._game_state = 1
 
     def _render_text(self: object) -> None:
-        
-        # The try and excepts are to prevent curses from raising an error when it tries to write outside of the terminal
+
+        layout = self._layout
+        addstr = self._renderer.addstr
 
         # score
-        addstr_robust(self._stdscr, self._grid_pos[1] + self._cell_size[1] * 3 - 1,
-                      self._grid_pos[0] + self._grid_size[0] * self._cell_size[0] + 5,
-                      f'{self._texts['score']}{self._score}')
+        addstr(*layout['score'], self._get_text('score', self._score))
 
         # highscore
-        addstr_robust(self._stdscr, self._grid_pos[1] + self._cell_size[1] * 2 - 1,
-                      self._grid_pos[0] + self._grid_size[0] * self._cell_size[0] + 5,
-                      f'{self._texts['highscore']}{self._save_data['highscore']}')
+        addstr(*layout['highscore'], self._get_text('highscore', self._save_data['highscore']))
 
         # highest tile
-        addstr_robust(self._stdscr, self._grid_pos[1] + self._cell_size[1] - 1,
-                      self._grid_pos[0] + self._grid_size[0] * self._cell_size[0] + 5,
-                      f'{self._texts['tile_highscore']}{self._save_data['tile_highscore']}')
-        
+        addstr(*layout['tile_highscore'], self._get_text('tile_highscore', self._save_data['tile_highscore']))
+
+        # hint and autoplay
+        if self._autoplay:
+            addstr(*layout['hint'], self._texts['autoplay'])
+        elif self._hint:
+            addstr(*layout['hint'], self._get_text('hint', self._hint))
+
         # info
-        addstr_robust(self._stdscr, 1, self._grid_pos[0] + math.ceil((((self._grid_size[0] - 1)
-                        * self._cell_size[0] + len(self._texts['empty_tile'])) - len(self._texts['info'])) / 2),
-                      self._texts['info'])
+        addstr(*layout['info'], self._texts['info'])
 
         # death
         if not self._game_state:
-            addstr_robust(self._stdscr, self._grid_pos[1] + self._grid_size[1] * self._cell_size[1] + 1,
-                          self._grid_pos[0] + math.ceil((((self._grid_size[0] - 1) * self._cell_size[0]
-                          + len(self._texts['empty_tile'])) - len(self._texts['death'])) / 2),
-                          self._texts['death'])
+            addstr(*layout['death'], self._texts['death'])
 
-        # the centering is around the first dot and last dot
-        
         # win
         elif self._game_state == 2:
-            for dex, string in enumerate(self._texts['win']):
-                addstr_robust(self._stdscr, self._grid_pos[1] + self._grid_size[1] * self._cell_size[1] + dex + 1,
-                              self._grid_pos[0] + math.ceil((((self._grid_size[0] - 1) * self._cell_size[0]
-                                + len(self._texts['empty_tile'])) - len(string)) / 2),
-                              string)
+            for pos, string in zip(layout['win'], self._texts['win']):
+                addstr(*pos, string)
 
     def run(self: object) -> None:
 
         running = 1
+        profiler = self._profiler
         
         try:
 
+            self._init_curses()
             self._reset()
 
             self._render_text()
             self._draw_grid()
+            self._renderer.present()
 
             while running:
-                key = self._stdscr.getkey()
-                self._handle_key_input(key)
-
-                if (self._grid.up() == self._grid.grid
-                    and self._grid.down() == self._grid.grid
-                    and self._grid.left() == self._grid.grid
-                    and self._grid.right() == self._grid.grid):
-
-                    self._game_state = 0 # dead
-                # i use an if statement so that it won't become 1
-                # if the condition is not satisfied; it will tay unchanged
-                if self._score > self._save_data['highscore']:
-                    self._save_data['highscore'] = self._score
-                    self._save_save_data_to_file()
-
-                for row in self._grid.grid:
-                    for item in row:
-                        if item > self._save_data['tile_highscore']:
-                            self._save_data['tile_highscore'] = item
-                            self._save_save_data_to_file()
-                        # I add the == 1 so it doesn't overwrite the game_state if it is 3
-                        if item >= self._base**self._winning_power and self._game_state == 1:
-                            self._game_state = 2
-
-                self._stdscr.erase()
-                self._render_text()
-                self._draw_grid()
-                self._stdscr.refresh()
+                with profiler.section('input'):
+                    try:
+                        key = self._stdscr.getkey()
+                    except curses.error:
+                        # getkey() only raises when autoplay is on and no key was pressed
+                        key = None
+                if key is None:
+                    # the search is timed on its own so 'input' stays the time spent waiting for keys
+                    with profiler.section('ai'):
+                        key = self._get_autoplay_key()
+                if key == 'KEY_RESIZE':
+                    self._compute_layout()
+                    self._renderer.invalidate()
+
+                with profiler.section('frame'):
+                    with profiler.section('handle_key_input'):
+                        self._handle_key_input(key)
+
+                    with profiler.section('game_over'):
+                        if not self._grid.can_move():
+                            self._game_state = 0 # dead
+
+                    with profiler.section('highscores'):
+                        # i use an if statement so that it won't become 1
+                        # if the condition is not satisfied; it will tay unchanged
+                        if self._score > self._save_data['highscore']:
+                            self._save_store.set('highscore', self._score)
+
+                        highest_tile = max(max(row) for row in self._grid.grid)
+                        if highest_tile > self._save_data['tile_highscore']:
+                            self._save_store.set('tile_highscore', highest_tile)
+                    # I add the == 1 so it doesn't overwrite the game_state if it is 3
+                    if highest_tile >= self._base**self._winning_power and self._game_state == 1:
+                        self._game_state = 2
+
+                    with profiler.section('render_text'):
+                        self._render_text()
+                    with profiler.section('draw_grid'):
+                        self._draw_grid()
+                    with profiler.section('refresh'):
+                        self._renderer.present()
+                profiler.count('cells_written', self._renderer.cells_written)
 
         except KeyboardInterrupt:
             pass
 
         finally:
-            curses.endwin()
+            if self._stdscr is not None:
+                curses.endwin()
+            self._save_store.close()
+            if self._replay is not None:
+                self._replay.close(self._score)
+            self._history.close()
+            if self._montecarlo_player is not None:
+                self._montecarlo_player.close()
 
             print(f'{self._texts['stats']}',
                   f' - {self._texts['score']}{self._score}',
                   f' - {self._texts['highscore']}{self._save_data['highscore']}',
                   f' - {self._texts['tile_highscore']}{self._save_data['tile_highscore']}', sep='\n')
 
+            if profiler.enabled:
+                profiler.count('save_writes', self._save_store.stats()['writes'])
+                profiler.dump()
+                print(profiler.format())
+
 
 if __name__ == '__main__':
-    Game().run()
+    parser = argparse.ArgumentParser(prog='python main.py', description='2048 in the terminal.')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='time the game loop and write the timings to PATH on exit '
+                             '(cProfile stats if it ends in .prof)')
+    parser.add_argument('--history-file', metavar='PATH',
+                        help='keep the undo history in a memory mapped ring file at PATH instead of in memory')
+    args = parser.parse_args()
+
+    Game(Profiler(path=args.profile) if args.profile else None, args.history_file).run()
 
@@ -0,0 +1,243 @@
+import collections
+import time
+
+import modules.bitboard as bitboard
+from modules.grid import SPAWN_CHOICES, SPAWN_RATES
+
+# row heuristic weights, the usual ones for 2048 expectimax players
+_EMPTY_WEIGHT = 270.0
+_MERGE_WEIGHT = 700.0
+_MONOTONICITY_WEIGHT = 47.0
+_MONOTONICITY_POWER = 4.0
+_SUM_WEIGHT = 11.0
+_SUM_POWER = 3.5
+_LOST_PENALTY = 200000.0
+
+_heuristic_table = None
+
+def _row_heuristic(row: int) -> float:
+
+    cells = [(row >> (4 * i)) & bitboard.CELL_MASK for i in range(4)]
+
+    empty = cells.count(0)
+    total = sum(cell ** _SUM_POWER for cell in cells)
+
+    merges = 0
+    previous = 0
+    counter = 0
+    for cell in cells:
+        if not cell:
+            continue
+        if cell == previous:
+            counter += 1
+        elif counter:
+            merges += 1 + counter
+            counter = 0
+        previous = cell
+    if counter:
+        merges += 1 + counter
+
+    monotonicity_left = 0.0
+    monotonicity_right = 0.0
+    for i in range(3):
+        if cells[i] > cells[i + 1]:
+            monotonicity_left += cells[i] ** _MONOTONICITY_POWER - cells[i + 1] ** _MONOTONICITY_POWER
+        else:
+            monotonicity_right += cells[i + 1] ** _MONOTONICITY_POWER - cells[i] ** _MONOTONICITY_POWER
+
+    return (_LOST_PENALTY + _EMPTY_WEIGHT * empty + _MERGE_WEIGHT * merges
+            - _MONOTONICITY_WEIGHT * min(monotonicity_left, monotonicity_right) - _SUM_WEIGHT * total)
+
+def _get_heuristic_table() -> list[float]:
+
+    # built the first time a player is made, so importing this module stays cheap
+    global _heuristic_table
+    if _heuristic_table is None:
+        _heuristic_table = [_row_heuristic(row) for row in range(65536)]
+
+    return _heuristic_table
+
+class _OutOfTime(Exception):
+    pass
+
+class ExpectimaxPlayer(object):
+    """
+    Picks moves for a 4x4 board with an expectimax search over the spawn distribution
+
+    params:
+        depth: how many moves to look ahead
+        time_budget: seconds per move; the search deepens from 1 up to depth
+                     and keeps the deepest result that finished in time (None means no limit)
+        cache_size: how many positions the transposition table keeps before evicting the least recently used
+        spawn_choices: the numbers that can spawn, like Game._spawn_choices
+        spawn_rates: the weights of spawn_choices, like Game._spawn_rates
+        min_probability: branches less likely than this are scored with the heuristic instead of searched
+    """
+
+    def __init__(self: object,
+                 depth: int=2,
+                 time_budget: float or None=None,
+                 cache_size: int=100000,
+                 spawn_choices: tuple[int]=SPAWN_CHOICES,
+                 spawn_rates: tuple[float]=SPAWN_RATES,
+                 min_probability: float=0.0001) -> None:
+
+        if type(depth) != int or depth < 1:
+            raise ValueError('depth needs to be an int of at least 1.')
+        if type(cache_size) != int or cache_size < 0:
+            raise ValueError('cache_size needs to be an int of at least 0.')
+        if len(spawn_choices) != len(spawn_rates):
+            raise ValueError('spawn_choices and spawn_rates need to be the same length.')
+
+        self._depth = depth
+        self._time_budget = time_budget
+        self._cache_size = cache_size
+        self._min_probability = min_probability
+
+        total = sum(spawn_rates)
+        self._spawns = tuple((bitboard.to_exponent(choice), rate / total)
+                             for choice, rate in zip(spawn_choices, spawn_rates))
+
+        self._heuristic_table = _get_heuristic_table()
+
+        # key is (board << 8) | depth, the board is already a compact hash of itself
+        self._cache = collections.OrderedDict()
+
+        self._deadline = None
+        self.reset_stats()
+
+    def reset_stats(self: object) -> None:
+
+        self.nodes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.search_time = 0.0
+        self.completed_depth = 0
+
+    def stats(self: object) -> dict:
+
+        lookups = self.cache_hits + self.cache_misses
+        return {'nodes': self.nodes,
+                'nodes_per_second': self.nodes / self.search_time if self.search_time else 0.0,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+                'cache_entries': len(self._cache),
+                'search_time': self.search_time,
+                'completed_depth': self.completed_depth}
+
+    def clear_cache(self: object) -> None:
+
+        self._cache.clear()
+
+    def _heuristic(self: object,
+                   board: int) -> float:
+
+        table = self._heuristic_table
+        transposed = bitboard.transpose(board)
+
+        return (table[board & 0xFFFF] + table[(board >> 16) & 0xFFFF]
+                + table[(board >> 32) & 0xFFFF] + table[board >> 48]
+                + table[transposed & 0xFFFF] + table[(transposed >> 16) & 0xFFFF]
+                + table[(transposed >> 32) & 0xFFFF] + table[transposed >> 48])
+
+    def _max_node(self: object,
+                  board: int,
+                  depth: int,
+                  probability: float) -> float:
+
+        self.nodes += 1
+        if self._deadline is not None and not self.nodes & 1023 and time.perf_counter() > self._deadline:
+            raise _OutOfTime
+
+        best = 0.0
+        for move in (bitboard.move_up, bitboard.move_down, bitboard.move_left, bitboard.move_right):
+            new_board = move(board)[0]
+            if new_board != board:
+                best = max(best, self._chance_node(new_board, depth, probability))
+
+        return best
+
+    def _chance_node(self: object,
+                     board: int,
+                     depth: int,
+                     probability: float) -> float:
+
+        if not depth or probability < self._min_probability:
+            return self._heuristic(board)
+
+        key = (board << 8) | depth
+        cache = self._cache
+        if key in cache:
+            self.cache_hits += 1
+            cache.move_to_end(key)
+            return cache[key]
+        self.cache_misses += 1
+
+        empty_cells = [4 * i for i in range(16) if not (board >> (4 * i)) & bitboard.CELL_MASK]
+        cell_probability = probability / len(empty_cells)
+
+        value = 0.0
+        for shift in empty_cells:
+            for tile, rate in self._spawns:
+                value += rate * self._max_node(board | (tile << shift), depth - 1, cell_probability * rate)
+        value /= len(empty_cells)
+
+        if self._cache_size:
+            cache[key] = value
+            if len(cache) > self._cache_size:
+                cache.popitem(last=False)
+
+        return value
+
+    def _search(self: object,
+                board: int,
+                depth: int) -> str or None:
+
+        best_move = None
+        best_value = -1.0
+        for direction in bitboard.DIRECTIONS:
+            new_board = bitboard.move(board, direction)[0]
+            if new_board != board:
+                value = self._chance_node(new_board, depth, 1.0)
+                if value > best_value:
+                    best_move, best_value = direction, value
+
+        return best_move
+
+    def best_move(self: object,
+                  board: int or list[list[int]]) -> str or None:
+        """
+        Finds the best move for a board
+
+        params:
+            board: a packed bitboard or a 4x4 grid like Grid.grid
+
+        returns 'up', 'down', 'left', 'right' or None if there is no move
+        """
+
+        if type(board) == list:
+            board = bitboard.to_board(board)
+
+        start = time.perf_counter()
+
+        try:
+            if self._time_budget is None:
+                best_move = self._search(board, self._depth)
+                self.completed_depth = self._depth
+            else:
+                # iterative deepening, depth 1 runs without a deadline so there is always an answer
+                best_move = self._search(board, 1)
+                self.completed_depth = 1
+                self._deadline = start + self._time_budget
+                for depth in range(2, self._depth + 1):
+                    try:
+                        best_move = self._search(board, depth)
+                        self.completed_depth = depth
+                    except _OutOfTime:
+                        break
+        finally:
+            self.search_time += time.perf_counter() - start
+            self._deadline = None
+
+        return best_move
@@ -0,0 +1,236 @@
+import numpy as np
+
+import modules.grid as grid
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+def _merge_lines_left(lines: np.ndarray) -> tuple[np.ndarray]:
+
+    # pushes every number to the start of its line, keeping their order
+    order = np.argsort(lines == 0, axis=1, kind='stable')
+    lines = np.take_along_axis(lines, order, axis=1)
+
+    scores = np.zeros(len(lines), dtype=lines.dtype)
+
+    # after the push, merging from the start of the line and shifting the rest
+    # over by one is the same as sliding the tiles one by one like Grid does
+    for x in range(lines.shape[1] - 1):
+        merge = (lines[:, x] != 0) & (lines[:, x] == lines[:, x + 1])
+        if not merge.any():
+            continue
+        lines[merge, x] *= 2
+        scores += np.where(merge, lines[:, x], 0)
+        lines[merge, x + 1:-1] = lines[merge, x + 2:]
+        lines[merge, -1] = 0
+
+    return lines, scores
+
+def _to_lines(boards: np.ndarray,
+              direction: str) -> np.ndarray:
+
+    # a view of the boards where every move is a move to the left
+    if direction == 'left':
+        return boards
+    elif direction == 'right':
+        return boards[:, :, ::-1]
+    elif direction == 'up':
+        return boards.transpose(0, 2, 1)
+    elif direction == 'down':
+        return boards.transpose(0, 2, 1)[:, :, ::-1]
+
+    raise ValueError('direction needs to be one of \'up\', \'down\', \'left\' or \'right\'.')
+
+def move_boards(boards: np.ndarray,
+                direction: str) -> tuple[np.ndarray]:
+    """
+    Moves a stack of boards in the same direction
+
+    params:
+        boards: an int array of shape (N, height, length)
+        direction: one of 'up', 'down', 'left' or 'right'
+
+    returns (moved boards, score gained per board, bool mask of the boards that changed)
+    """
+
+    view = _to_lines(boards, direction)
+    count, line_count, line_length = view.shape
+
+    lines, scores = _merge_lines_left(view.reshape(count * line_count, line_length))
+
+    new_boards = np.empty_like(boards)
+    # writing through the same view puts every line back where it came from
+    _to_lines(new_boards, direction)[...] = lines.reshape(count, line_count, line_length)
+
+    return (new_boards, scores.reshape(count, line_count).sum(axis=1),
+            (new_boards != boards).any(axis=(1, 2)))
+
+class BatchGrid(object):
+    """
+    Many boards of the same size moved together with NumPy
+
+    params:
+        count: how many boards
+        size: tuple[int length, int height], like Grid
+        seed: seed for the spawning random number generator
+    """
+
+    def __init__(self: object,
+                 count: int,
+                 size: tuple[int],
+                 seed: int or None=None) -> None:
+
+        if type(count) != int or count <= 0:
+            raise ValueError('count needs to be an int of at least 1.')
+        if type(size) != tuple or len(size) != 2:
+            raise ValueError('size needs to be tuple[int length, int height].')
+        for item in size:
+            if type(item) != int:
+                raise ValueError('size needs to be tuple[int length, int height].')
+            elif item <= 0:
+                raise ValueError('size needs to be at least tuple[1, 1].')
+
+        self._size = size
+        self._boards = np.zeros((count, size[1], size[0]), dtype=np.int64)
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_grids(cls: type,
+                   grids: list[grid.Grid or list[list[int]]],
+                   seed: int or None=None) -> object:
+
+        boards = np.array([item.grid if isinstance(item, grid.Grid) else item for item in grids],
+                          dtype=np.int64)
+        batch = cls(len(boards), (boards.shape[2], boards.shape[1]), seed)
+        batch._boards = boards
+
+        return batch
+
+    def to_grids(self: object) -> list[list[list[int]]]:
+
+        return self._boards.tolist()
+
+    @property
+    def boards(self: object) -> np.ndarray:
+
+        return self._boards
+
+    @boards.setter
+    def boards(self: object,
+               value: np.ndarray) -> None:
+
+        if value.shape[1:] != (self._size[1], self._size[0]):
+            raise ValueError('boards need to be of shape (count, height, length).')
+
+        self._boards = value
+
+    @property
+    def size(self: object) -> tuple[int]:
+
+        return self._size
+
+    @property
+    def count(self: object) -> int:
+
+        return len(self._boards)
+
+    def reset(self: object) -> None:
+
+        self._boards[...] = 0
+
+    def spawn_new_numbers(self: object,
+                          count: int,
+                          choices: list or tuple[int],
+                          weights: list or tuple[float] or None=None,
+                          mask: np.ndarray or None=None) -> np.ndarray:
+        """
+        Spawns numbers on random empty cells of every board, like Grid.spawn_new_numbers
+
+        params:
+            count: how many numbers per board
+            choices: the numbers that can spawn
+            weights: the weights of choices (None means all equally likely)
+            mask: bool array of the boards to spawn on (None means all)
+
+        returns how many numbers were spawned on each board
+        """
+
+        probabilities = None
+        if weights is not None:
+            probabilities = np.asarray(weights, dtype=float)
+            probabilities /= probabilities.sum()
+
+        flat = self._boards.reshape(self.count, -1)
+        board_indices = np.arange(self.count)
+        spawned = np.zeros(self.count, dtype=np.int64)
+
+        for i in range(count):
+            # the empty cell with the highest random key is a uniformly random empty cell
+            keys = self._rng.random(flat.shape)
+            keys[flat != 0] = -1.0
+            cells = keys.argmax(axis=1)
+            has_space = keys[board_indices, cells] >= 0
+            if mask is not None:
+                has_space &= mask
+
+            values = self._rng.choice(np.asarray(choices, dtype=np.int64), size=self.count, p=probabilities)
+            flat[board_indices[has_space], cells[has_space]] = values[has_space]
+            spawned += has_space
+
+        return spawned
+
+    def move(self: object,
+             direction: str or np.ndarray) -> tuple[np.ndarray]:
+        """
+        Moves every board in place
+
+        params:
+            direction: one of 'up', 'down', 'left' or 'right' for all boards,
+                       or an int array with an index into DIRECTIONS per board
+
+        returns (score gained per board, bool mask of the boards that changed)
+        """
+
+        if type(direction) == str:
+            self._boards, scores, moved = move_boards(self._boards, direction)
+            return scores, moved
+
+        direction = np.asarray(direction)
+        if direction.shape != (self.count,):
+            raise ValueError('direction needs to be a str or an array with one direction per board.')
+
+        scores = np.zeros(self.count, dtype=np.int64)
+        moved = np.zeros(self.count, dtype=bool)
+
+        for dex, name in enumerate(DIRECTIONS):
+            selected = np.flatnonzero(direction == dex)
+            if not len(selected):
+                continue
+            new_boards, scores[selected], moved[selected] = move_boards(self._boards[selected], name)
+            self._boards[selected] = new_boards
+
+        return scores, moved
+
+    def up(self: object) -> tuple[np.ndarray]:
+
+        return self.move('up')
+
+    def down(self: object) -> tuple[np.ndarray]:
+
+        return self.move('down')
+
+    def left(self: object) -> tuple[np.ndarray]:
+
+        return self.move('left')
+
+    def right(self: object) -> tuple[np.ndarray]:
+
+        return self.move('right')
+
+    def can_move(self: object) -> np.ndarray:
+
+        boards = self._boards
+        # same rule as Grid.can_move: an empty cell or two equal neighbours
+        filled = boards != 0
+        return ((~filled).any(axis=(1, 2)) & filled.any(axis=(1, 2))
+                | ((boards[:, :, 1:] == boards[:, :, :-1]) & filled[:, :, 1:]).any(axis=(1, 2))
+                | ((boards[:, 1:, :] == boards[:, :-1, :]) & filled[:, 1:, :]).any(axis=(1, 2)))
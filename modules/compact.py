@@ -0,0 +1,330 @@
+import random
+
+# (size, direction) -> the lines of cell indices a move goes through, shared by all boards
+_lines_cache = {}
+
+class CompactGrid(object):
+    """
+    A Grid that keeps its tiles as exponents in one bytearray, for keeping many boards in memory
+
+    Cell (x, y) is byte y * length + x, 0 is empty and e is the number base**e. Slots and
+    the bytearray keep a board at a fraction of Grid's memory, .copy() is one bytearray copy and
+    boards with the same tiles are equal and hash the same (so don't move a board while
+    it is a dict key)
+
+    It has the same methods as modules.grid.Grid and spawns the same numbers for the same rng
+
+    params:
+        size: tuple[int length, int height]
+        rng: the random number generator to spawn with (the random module by default)
+        base: the base of the numbers (Game._base)
+    """
+
+    __slots__ = ('_size', '_cells', '_base', '_rng', '_empty_count')
+
+    def __init__(self: object,
+                 size: tuple,
+                 rng: random.Random or None=None,
+                 base: int=2):
+
+        self._size = size
+        self._cells = bytearray(size[0] * size[1])
+        self._base = base
+        self._rng = rng if rng is not None else random
+        self._empty_count = size[0] * size[1]
+
+    def __eq__(self: object,
+               other: object) -> bool:
+
+        if not isinstance(other, CompactGrid):
+            return NotImplemented
+
+        return self._size == other._size and self._base == other._base and self._cells == other._cells
+
+    def __hash__(self: object) -> int:
+
+        return hash((self._size, self._base, bytes(self._cells)))
+
+    def copy(self: object) -> object:
+
+        new = CompactGrid.__new__(CompactGrid)
+        new._size = self._size
+        new._cells = self._cells[:]
+        new._base = self._base
+        new._rng = self._rng
+        new._empty_count = self._empty_count
+
+        return new
+
+    def _to_exponent(self: object,
+                     value: int) -> int:
+
+        if not value:
+            return 0
+
+        exponent = 0
+        number = 1
+        while number < value:
+            number *= self._base
+            exponent += 1
+        if number != value or not 0 < exponent <= 255:
+            raise ValueError(f'{value} can not be stored, numbers need to be a power of {self._base}.')
+
+        return exponent
+
+    @property
+    def cells(self: object) -> bytearray:
+        'The exponents, row by row'
+
+        return self._cells
+
+    @property
+    def base(self: object) -> int:
+
+        return self._base
+
+    @property
+    def grid(self: object) -> list[list[int]]:
+        'A new list of lists of the numbers, changing it does not change the board'
+
+        base = self._base
+        length = self._size[0]
+        cells = self._cells
+
+        return [[base**item if item else 0 for item in cells[start:start + length]]
+                for start in range(0, len(cells), length)]
+
+    @grid.setter
+    def grid(self: object,
+             value: list[list[int]]) -> None:
+
+        if type(value) != list:
+            raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+        for row in value:
+            if type(row) != list:
+                raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+            if (len(row), len(value)) != self._size:
+                raise ValueError('new grid needs to be the same size as was last set ' \
+                                 'and the length of all rows should be the same.')
+            for item in row:
+                if type(item) != int:
+                    raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+
+        self._cells = bytearray(self._to_exponent(item) for row in value for item in row)
+        self._empty_count = self._cells.count(0)
+
+    @property
+    def rng(self: object) -> random.Random:
+
+        return self._rng
+
+    @rng.setter
+    def rng(self: object,
+            value: random.Random or None) -> None:
+
+        self._rng = value if value is not None else random
+
+    @property
+    def size(self: object) -> tuple[int]:
+
+        return self._size
+
+    @size.setter
+    def size(self: object,
+             value: tuple[int]) -> None:
+
+        if type(value) != tuple or len(value) != 2:
+            raise ValueError('size needs to be tuple[int length, int height].')
+        for item in value:
+            if type(item) != int:
+                raise ValueError('size needs to be tuple[int length, int height].')
+            elif item <= 0:
+                raise ValueError('size needs to be at least tuple[1, 1].')
+
+        # like Grid, tiles outside of the new size are cut off
+        old_length, old_height = self._size
+        cells = bytearray(value[0] * value[1])
+        for y in range(min(old_height, value[1])):
+            width = min(old_length, value[0])
+            cells[y * value[0]:y * value[0] + width] = self._cells[y * old_length:y * old_length + width]
+
+        self._size = value
+        self._cells = cells
+        self._empty_count = cells.count(0)
+
+    def reset(self: object) -> None:
+
+        self._cells = bytearray(self._size[0] * self._size[1])
+        self._empty_count = len(self._cells)
+
+    def available_moves(self: object) -> tuple[str]:
+
+        width, height = self._size
+        cells = self._cells
+
+        up = down = left = right = False
+
+        for dex, item in enumerate(cells):
+            # a tile can move towards a neighbour if the neighbour is empty or the same number
+            if (dex + 1) % width:
+                neighbour = cells[dex + 1]
+                if item and (not neighbour or neighbour == item):
+                    right = True
+                if neighbour and (not item or neighbour == item):
+                    left = True
+            if dex + width < len(cells):
+                neighbour = cells[dex + width]
+                if item and (not neighbour or neighbour == item):
+                    down = True
+                if neighbour and (not item or neighbour == item):
+                    up = True
+
+            if up and down and left and right:
+                break
+
+        return tuple(direction for direction, possible
+                     in (('up', up), ('down', down), ('left', left), ('right', right)) if possible)
+
+    def can_move(self: object) -> bool:
+
+        if self._empty_count:
+            return self._empty_count < len(self._cells)
+
+        width = self._size[0]
+        cells = self._cells
+
+        for dex, item in enumerate(cells):
+            if (dex + 1) % width and cells[dex + 1] == item:
+                return True
+            if dex + width < len(cells) and cells[dex + width] == item:
+                return True
+
+        return False
+
+    def spawn_new_numbers(self: object,
+                          count: int,
+                          choices: list or tuple[int],
+                          weights: list or tuple[float] or None=None) -> list[tuple[int]]:
+        'Returns the spawned numbers as [(x, y, number)...]'
+
+        # the empty cells in the same order as Grid, so the same rng spawns the same numbers
+        available_spaces = [dex for dex, item in enumerate(self._cells) if not item]
+        spawned = []
+        length = self._size[0]
+
+        for i in range(min(count, len(available_spaces))):
+            dex = self._rng.randrange(0, len(available_spaces))
+            cell = available_spaces.pop(dex)
+
+            value = self._rng.choices(choices, weights, k=1)[0]
+            self._cells[cell] = self._to_exponent(value)
+            self._empty_count -= 1
+            spawned.append((cell % length, cell // length, value))
+
+        return spawned
+
+    def _get_lines(self: object,
+                   direction: str) -> tuple[tuple[int]]:
+
+        key = (self._size, direction)
+        lines = _lines_cache.get(key)
+        if lines is None:
+            width, height = self._size
+            if direction == 'up':
+                lines = tuple(tuple(y * width + x for y in range(height)) for x in range(width))
+            elif direction == 'down':
+                lines = tuple(tuple(y * width + x for y in range(height - 1, -1, -1)) for x in range(width))
+            elif direction == 'left':
+                lines = tuple(tuple(y * width + x for x in range(width)) for y in range(height))
+            elif direction == 'right':
+                lines = tuple(tuple(y * width + x for x in range(width - 1, -1, -1)) for y in range(height))
+            else:
+                raise ValueError('direction needs to be one of \'up\', \'down\', \'left\' or \'right\'.')
+            _lines_cache[key] = lines
+
+        return lines
+
+    def _move_cells(self: object,
+                    cells: bytearray,
+                    direction: str) -> tuple[int]:
+        """
+        Moves the cells in place, the same way as Grid._move_grid()
+
+        returns (score, number of merges, whether anything moved)
+        """
+
+        base = self._base
+        score = 0
+        merges = 0
+        moved = False
+
+        for line in self._get_lines(direction):
+            write = 0
+            last = 0
+            for dex, cell in enumerate(line):
+                item = cells[cell]
+                if not item:
+                    continue
+                if item == last:
+                    cells[line[write - 1]] = item + 1
+                    score += base**(item + 1)
+                    merges += 1
+                    last = 0
+                    moved = True
+                else:
+                    if write != dex:
+                        cells[line[write]] = item
+                        moved = True
+                    last = item
+                    write += 1
+
+            for dex in range(write, len(line)):
+                cells[line[dex]] = 0
+
+        return score, merges, moved
+
+    def move(self: object,
+             direction: str) -> tuple[int, bool]:
+        """
+        Moves the board in place
+
+        params:
+            direction: one of 'up', 'down', 'left' or 'right'
+
+        returns (score, whether anything moved)
+        """
+
+        score, merges, moved = self._move_cells(self._cells, direction)
+        self._empty_count += merges
+
+        return score, moved
+
+    def _copy_and_move(self: object,
+                       direction: str,
+                       return_score: int) -> list or tuple:
+
+        new = self.copy()
+        score = new.move(direction)[0]
+        return_grid = new.grid
+
+        return (return_grid, score) if return_score else return_grid
+
+    def up(self: object,
+           return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('up', return_score)
+
+    def down(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('down', return_score)
+
+    def left(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('left', return_score)
+
+    def right(self: object,
+              return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('right', return_score)
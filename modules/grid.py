@@ -1,15 +1,57 @@
-import copy
-import curses
+import math
 import random
 
+import modules.tables as tables
+
+# the loop alone is used when this is False (bench/bench_tables.py compares the two)
+USE_TABLES = True
+
+# (size, direction) -> the lines of positions a move goes through, shared by all grids
+_lines_cache = {}
+
+# the defaults of Game in main.py, for everything that plays games without it
+DEFAULT_SIZE = (4, 4)
+SPAWN_CHOICES = (2, 4)
+SPAWN_RATES = (90, 10)
+WIN_TILE = 2**11
+
+def percentile(sorted_values: list[float],
+               percent: float) -> float:
+    """
+    The value percent of the way through sorted_values
+
+    params:
+        sorted_values: the values, sorted from low to high
+        percent: 0 to 100
+
+    returns 0.0 if there are no values
+    """
+
+    if not sorted_values:
+        return 0.0
+
+    return sorted_values[min(len(sorted_values) - 1, math.floor(len(sorted_values) * percent / 100))]
+
 class Grid(object):
 
     def __init__(self: object,
-                 size: tuple):
+                 size: tuple,
+                 rng: random.Random or None=None):
         
         self._size = size
         self._grid = self._create_grid(size)
 
+        # spawning uses the random module unless it is given its own generator (for replays)
+        self._rng = rng if rng is not None else random
+
+        # kept up to date by every method that changes the grid
+        # so can_move() does not need to scan the grid while there are gaps
+        # note: editing the list returned by .grid directly will not update this
+        self._empty_count = size[0] * size[1]
+
+        # the row move table of this width (None if there is none), looked up on the first left or right move
+        self._row_table = False
+
     @property
     def grid(self: object) -> list[list[int]]:
 
@@ -37,11 +79,24 @@ class Grid(object):
                     raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
 
             self._grid = value
+
+        self._empty_count = self._count_empty()
     
+    @property
+    def rng(self: object) -> random.Random:
+
+        return self._rng
+
+    @rng.setter
+    def rng(self: object,
+            value: random.Random or None) -> None:
+
+        self._rng = value if value is not None else random
+
     @property
     def size(self: object) -> tuple[int]:
 
-        return size
+        return self._size
 
     @size.setter
     def size(self: object,
@@ -72,6 +127,8 @@ class Grid(object):
                 del self._grid[y]
                 
         self._size = value
+        self._empty_count = self._count_empty()
+        self._row_table = False
 
     def _create_grid(self: object,
                      size: tuple) -> None:
@@ -82,15 +139,82 @@ class Grid(object):
         
         return grid
 
+    def _count_empty(self: object) -> int:
+
+        return sum(row.count(0) for row in self._grid)
+
     def reset(self: object) -> None:
         self._grid = self._create_grid(self._size)
+        self._empty_count = self._size[0] * self._size[1]
+
+    def available_moves(self: object) -> tuple[str]:
+        """
+        Finds the directions that would change the grid in one pass
+
+        returns a tuple of 'up', 'down', 'left' and 'right' in that order
+        """
+
+        width, height = self._size
+        grid = self._grid
+
+        up = down = left = right = False
+
+        for y in range(height):
+            row = grid[y]
+            below = grid[y + 1] if y + 1 < height else None
+            for x in range(width):
+                item = row[x]
+                # a tile can move towards a neighbour if the neighbour is empty or the same number
+                if x + 1 < width:
+                    neighbour = row[x + 1]
+                    if item and (not neighbour or neighbour == item):
+                        right = True
+                    if neighbour and (not item or neighbour == item):
+                        left = True
+                if below is not None:
+                    neighbour = below[x]
+                    if item and (not neighbour or neighbour == item):
+                        down = True
+                    if neighbour and (not item or neighbour == item):
+                        up = True
+
+            if up and down and left and right:
+                break
+
+        return tuple(direction for direction, possible
+                     in (('up', up), ('down', down), ('left', left), ('right', right)) if possible)
+
+    def can_move(self: object) -> bool:
+
+        # any gap means some tile can slide into it
+        # (unless the grid is completely empty, which can not move either)
+        if self._empty_count:
+            return self._empty_count < self._size[0] * self._size[1]
+
+        grid = self._grid
+        width, height = self._size
+
+        for y in range(height):
+            row = grid[y]
+            for x in range(width - 1):
+                if row[x] == row[x + 1]:
+                    return True
+            if y + 1 < height:
+                below = grid[y + 1]
+                for x in range(width):
+                    if row[x] == below[x]:
+                        return True
+
+        return False
 
     def spawn_new_numbers(self: object, 
                           count: int,
                           choices: list or tuple[int],
-                          weights: list or tuple[float] or None=None) -> None:
+                          weights: list or tuple[float] or None=None) -> list[tuple[int]]:
+        'Returns the spawned numbers as [(x, y, number)...]'
 
         available_spaces = []
+        spawned = []
 
         for y in range(self._size[1]):
             for x in range(self._size[0]):
@@ -99,149 +223,168 @@ class Grid(object):
                     
         for i in range(min(count, len(available_spaces),
                            self._size[0] * self._size[1])):
-            dex = random.randrange(0, len(available_spaces))
+            dex = self._rng.randrange(0, len(available_spaces))
             random_pos = available_spaces[dex]
             del available_spaces[dex]
 
-            self._grid[random_pos[1]][random_pos[0]] = random.choices(choices, weights, k=1)[0]
+            value = self._rng.choices(choices, weights, k=1)[0]
+            self._grid[random_pos[1]][random_pos[0]] = value
+            self._empty_count -= 1
+            spawned.append((random_pos[0], random_pos[1], value))
+
+        return spawned
+
+    def _get_lines(self: object,
+                   direction: str) -> tuple[tuple[tuple[int]]]:
+
+        # every line is the (y, x) positions of a row or column, in the order the tiles move towards
+        # so moving in any direction is "push the tiles to the start of each line"
+        key = (self._size, direction)
+        lines = _lines_cache.get(key)
+        if lines is None:
+            width, height = self._size
+            if direction == 'up':
+                lines = tuple(tuple((y, x) for y in range(height)) for x in range(width))
+            elif direction == 'down':
+                lines = tuple(tuple((y, x) for y in range(height - 1, -1, -1)) for x in range(width))
+            elif direction == 'left':
+                lines = tuple(tuple((y, x) for x in range(width)) for y in range(height))
+            elif direction == 'right':
+                lines = tuple(tuple((y, x) for x in range(width - 1, -1, -1)) for y in range(height))
+            else:
+                raise ValueError('direction needs to be one of \'up\', \'down\', \'left\' or \'right\'.')
+            _lines_cache[key] = lines
+
+        return lines
+
+    def _move_rows_table(self: object,
+                         grid: list[list[int]],
+                         direction: str,
+                         table: tables.RowTable) -> tuple:
+        """
+        Moves the rows of a grid left or right in place with the row move table
+
+        returns (score, number of merges, whether anything moved, the lines from
+        ._get_lines() that have a tile the table can't hold and still need moving)
+        """
+
+        move_line = table.move_line
+        score = 0
+        merges = 0
+        moved = False
+        skipped = []
+
+        for y, row in enumerate(grid):
+            result = move_line(tuple(row) if direction == 'left' else tuple(row[::-1]))
+            if result is None:
+                skipped.append(y)
+            elif result[0] is not None:
+                row[:] = result[0] if direction == 'left' else result[0][::-1]
+                score += result[1]
+                merges += result[2]
+                moved = True
+
+        lines = self._get_lines(direction)
+
+        return score, merges, moved, [lines[y] for y in skipped]
+
+    def _move_grid(self: object,
+                   grid: list[list[int]],
+                   direction: str) -> tuple[int]:
+        """
+        Moves a grid in place
+
+        rows go through the row move table of their width when there is one, columns
+        always go through the loop below, gathering them out of the rows costs more
+        than the table saves
+
+        returns (score, number of merges, whether anything moved)
+        """
+
+        lines = self._get_lines(direction)
+        score = 0
+        merges = 0
+        moved = False
+
+        # widths without a table only pay for this first check once the table has been looked up
+        table = self._row_table
+        if table is not None and (direction == 'left' or direction == 'right') and USE_TABLES:
+            if table is False:
+                table = self._row_table = tables.get_table(self._size[0])
+            if table is not None:
+                score, merges, moved, lines = self._move_rows_table(grid, direction, table)
+
+        for line in lines:
+            # write is where the next tile goes, last is the tile before it if it can still combine
+            write = 0
+            last = 0
+            for dex, (y, x) in enumerate(line):
+                item = grid[y][x]
+                if not item:
+                    continue
+                # tiles only combine once per move, so last is cleared after combining
+                if item == last:
+                    target = line[write - 1]
+                    grid[target[0]][target[1]] = item * 2
+                    score += item * 2
+                    merges += 1
+                    last = 0
+                    moved = True
+                else:
+                    if write != dex:
+                        target = line[write]
+                        grid[target[0]][target[1]] = item
+                        moved = True
+                    last = item
+                    write += 1
+
+            for dex in range(write, len(line)):
+                target = line[dex]
+                grid[target[0]][target[1]] = 0
+
+        return score, merges, moved
+
+    def move(self: object,
+             direction: str) -> tuple[int, bool]:
+        """
+        Moves the grid in place without making a new grid
+
+        params:
+            direction: one of 'up', 'down', 'left' or 'right'
+
+        returns (score, whether anything moved)
+        """
+
+        score, merges, moved = self._move_grid(self._grid, direction)
+        self._empty_count += merges
+
+        return score, moved
+
+    def _copy_and_move(self: object,
+                       direction: str,
+                       return_score: int) -> list or tuple:
+
+        return_grid = [row[:] for row in self._grid]
+        score = self._move_grid(return_grid, direction)[0]
+
+        return (return_grid, score) if return_score else return_grid
 
     def up(self: object,
            return_score: int=0) -> list or tuple:
 
-        return_grid = copy.deepcopy(self._grid)
-
-        score = 0
+        return self._copy_and_move('up', return_score)
 
-        # a grid containing the combined status of each value
-        # what I mean is that, if the number at a position is 1
-        # the tile at that position on the real grid was combined during this iteration
-        # tiles should only combine with tiles not combined during this iteration
-        combined_statuses = self._create_grid(self._size)
-
-        for x in range(self._size[0]):
-            for y in range(1, self._size[1]):
-                unchanged_value = return_grid[y][x]
-                current_y = y
-                # repeatedly checks if there is available space above
-                # moves the number if there is
-                while current_y > 0 and not return_grid[current_y - 1][x]:
-                    return_grid[current_y - 1][x] = unchanged_value 
-                    return_grid[current_y][x] = 0
-                    current_y -= 1
-                # checks for combining numbers
-                if (current_y > 0 and not combined_statuses[current_y - 1][x]
-                    and unchanged_value == return_grid[current_y - 1][x]):
-
-                    return_grid[current_y - 1][x] = unchanged_value * 2
-                    combined_statuses[current_y - 1][x] = 1
-                    return_grid[current_y][x] = 0
-                    score += unchanged_value * 2
-
-        return (return_grid, score) if return_score else return_grid
-        
     def down(self: object,
              return_score: int=0) -> list or tuple:
 
-        return_grid =  copy.deepcopy(self._grid)
-
-        score = 0
-
-        # a grid containing the combined status of each value
-        # what I mean is that, if the number at a position is 1
-        # the tile at that position on the real grid was combined during this iteration
-        # tiles should only combine with tiles not combined during this iteration
-        combined_statuses = self._create_grid(self._size)
-
-        for x in range(self._size[0]):
-            for y in range(self._size[1] - 2, -1, -1):
-                unchanged_value = return_grid[y][x]
-                current_y = y
-                # repeatedly checks if there is available space below
-                # moves the number if there is
-                while current_y < self._size[1] - 1 and not return_grid[current_y + 1][x]:
-                    return_grid[current_y + 1][x] = unchanged_value
-                    return_grid[current_y][x] = 0
-                    current_y += 1
-                # checks for combining numbers
-
-                if (current_y < self._size[1] - 1 and not combined_statuses[current_y + 1][x]
-                    and unchanged_value == return_grid[current_y + 1][x]):
-
-                    return_grid[current_y + 1][x] = unchanged_value * 2
-                    combined_statuses[current_y + 1][x] = 1
-                    return_grid[current_y][x] = 0
-                    score += unchanged_value * 2
-
-        return (return_grid, score) if return_score else return_grid
+        return self._copy_and_move('down', return_score)
 
     def left(self: object,
              return_score: int=0) -> list or tuple:
 
-        return_grid = copy.deepcopy(self._grid)
-        
-        score = 0
-
-        # a grid containing the combined status of each value
-        # what I mean is that, if the number at a position is 1
-        # the tile at that position on the real grid was combined during this iteration
-        # tiles should only combine with tiles not combined during this iteration
-        combined_statuses = self._create_grid(self._size)
-
-        for y in range(self._size[1]):
-            for x in range(1, self._size[0]):
-                unchanged_value = return_grid[y][x]
-                current_x = x
-                # repeatedly checks if there is available space above
-                # moves the number if there is
-                while current_x > 0 and not return_grid[y][current_x - 1]:
-                    return_grid[y][current_x - 1] = unchanged_value 
-                    return_grid[y][current_x] = 0
-                    current_x -= 1
-                # checks for combining numbers
-                if (current_x > 0 and not combined_statuses[y][current_x - 1] 
-                    and unchanged_value == return_grid[y][current_x - 1]):
-
-                    return_grid[y][current_x - 1] = unchanged_value * 2
-                    combined_statuses[y][current_x - 1] = 1
-                    return_grid[y][current_x] = 0
-                    score += unchanged_value * 2
-
-        return (return_grid, score) if return_score else return_grid
+        return self._copy_and_move('left', return_score)
 
     def right(self: object,
               return_score: int=0) -> list or tuple:
 
-        return_grid = copy.deepcopy(self._grid)
-
-        score = 0
-
-        # a grid containing the combined status of each value
-        # what I mean is that, if the number at a position is 1
-        # the tile at that position on the real grid was combined during this iteration
-        # tiles should only combine with tiles not combined during this iteration
-        combined_statuses = self._create_grid(self._size)
-
-        for y in range(self._size[1]):
-            for x in range(self._size[0] - 2, -1, -1):
-                unchanged_value = return_grid[y][x]
-                current_x = x
-                # repeatedly checks if there is available space below
-                # moves the number if there is
-                while current_x < self._size[0] - 1 and not return_grid[y][current_x + 1]:
-                    return_grid[y][current_x + 1] = unchanged_value
-                    return_grid[y][current_x] = 0
-                    current_x += 1
-
-                # checks for combining numbers
-                if (current_x < self._size[0] - 1 and not combined_statuses[y][current_x + 1]
-                    and unchanged_value == return_grid[y][current_x + 1]):
-
-                    return_grid[y][current_x + 1] = unchanged_value * 2
-                    combined_statuses[y][current_x + 1] = 1
-                    return_grid[y][current_x] = 0
-                    score += unchanged_value * 2
-
-        return (return_grid, score) if return_score else return_grid
-
-        
-
+        return self._copy_and_move('right', return_score)
@@ -0,0 +1,257 @@
+"""
+Undo/redo history stored as xor deltas of the tile exponents
+
+Every entry is what one move changed: the score it gained and, for every cell that
+changed, the cell and the xor of its exponent before and after. Applying an entry
+to the board after it gives the board before it and the other way around, so the
+same bytes are used for undo and redo. A move on a 4x4 board changes a handful of
+cells, so an entry is around a dozen bytes plus 8 for its offset, instead of a copy
+of the whole board
+
+Entries live one after another in a bytearray, or in a memory mapped ring file
+for very long games, where the oldest entries are written over once the file is full
+"""
+
+import array
+import mmap
+
+import modules.varint as varint
+
+class _RingFile(object):
+    'A file of a fixed size that is written round and round, addressed by an offset that keeps growing'
+
+    def __init__(self: object,
+                 path: str,
+                 size: int) -> None:
+
+        self.size = size
+        self._file = open(path, 'w+b')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def write(self: object,
+              offset: int,
+              data: bytes) -> None:
+
+        start = offset % self.size
+        first = min(len(data), self.size - start)
+        self._map[start:start + first] = data[:first]
+        self._map[:len(data) - first] = data[first:]
+
+    def read(self: object,
+             offset: int,
+             length: int) -> bytes:
+
+        start = offset % self.size
+        first = min(length, self.size - start)
+
+        return self._map[start:start + first] + self._map[:length - first]
+
+    def close(self: object) -> None:
+
+        self._map.close()
+        self._file.close()
+
+class History(object):
+    """
+    Undo and redo for any grid with the Grid methods
+
+        history.record(history.cells_of(grid_obj), ...) before and after a move
+        score -= history.undo(grid_obj)
+        score += history.redo(grid_obj)
+
+    params:
+        base: the base of the numbers (Game._base)
+        ring_path: keep the entries in a memory mapped ring file here instead of in memory
+        ring_size: bytes of the ring file, the oldest entries can't be undone anymore once it is full
+    """
+
+    def __init__(self: object,
+                 base: int=2,
+                 ring_path: str or None=None,
+                 ring_size: int=16 * 1024 * 1024) -> None:
+
+        self._base = base
+        # number -> exponent, filled in as numbers show up
+        self._exponents = {0: 0}
+
+        self._ring = _RingFile(ring_path, ring_size) if ring_path is not None else None
+        self._data = bytearray()
+
+        # where every entry starts, entries before _first have been written over in the ring file
+        self._offsets = array.array('Q')
+        self._first = 0
+        self._end = 0
+        # entries before _position can be undone, the ones from it on redone
+        self._position = 0
+
+    def __len__(self: object) -> int:
+
+        return len(self._offsets) - self._first
+
+    @property
+    def can_undo(self: object) -> bool:
+
+        return self._position > self._first
+
+    @property
+    def can_redo(self: object) -> bool:
+
+        return self._position < len(self._offsets)
+
+    def cells_of(self: object,
+                 grid_obj: object) -> bytes:
+        'The exponents of a grid, row by row'
+
+        cells = getattr(grid_obj, 'cells', None)
+        if cells is not None:
+            return bytes(cells)
+
+        exponents = self._exponents
+        try:
+            return bytes([exponents[item] for row in grid_obj.grid for item in row])
+        except KeyError:
+            for row in grid_obj.grid:
+                for item in row:
+                    if item not in exponents:
+                        exponent = 0
+                        number = item
+                        while number >= self._base:
+                            number //= self._base
+                            exponent += 1
+                        exponents[item] = exponent
+            return bytes([exponents[item] for row in grid_obj.grid for item in row])
+
+    def _set_cells(self: object,
+                   grid_obj: object,
+                   cells: bytes) -> None:
+
+        length = grid_obj.size[0]
+        base = self._base
+        grid_obj.grid = [[base**item if item else 0 for item in cells[start:start + length]]
+                         for start in range(0, len(cells), length)]
+
+    def clear(self: object) -> None:
+
+        self._data = bytearray()
+        self._offsets = array.array('Q')
+        self._first = 0
+        self._end = 0
+        self._position = 0
+
+    def record(self: object,
+               before: bytes,
+               after: bytes,
+               score: int) -> None:
+        """
+        Adds a move, everything that could be redone is dropped
+
+        params:
+            before: .cells_of() the grid before the move
+            after: .cells_of() the grid after the move and its spawn
+            score: the score the move gained
+        """
+
+        entry = bytearray(varint.encode(score))
+        for cell, (old, new) in enumerate(zip(before, after)):
+            if old != new:
+                entry += varint.encode(cell)
+                entry.append(old ^ new)
+
+        # a new move after undoing makes the undone moves unreachable
+        if self._position < len(self._offsets):
+            self._end = self._offsets[self._position]
+            del self._offsets[self._position:]
+            if self._ring is None:
+                del self._data[self._end:]
+
+        offset = self._end
+        if self._ring is None:
+            self._data += entry
+        else:
+            if len(entry) > self._ring.size:
+                raise ValueError('the ring file is too small to hold a single move.')
+            self._ring.write(offset, entry)
+
+        self._offsets.append(offset)
+        self._end = offset + len(entry)
+        self._position = len(self._offsets)
+
+        if self._ring is not None:
+            # drop the entries that were just written over
+            while self._end - self._offsets[self._first] > self._ring.size:
+                self._first += 1
+            # the offsets of dropped entries go once they are half of the array
+            if self._first > 1024 and self._first * 2 > len(self._offsets):
+                del self._offsets[:self._first]
+                self._position -= self._first
+                self._first = 0
+
+    def _read_entry(self: object,
+                    dex: int) -> bytes:
+
+        start = self._offsets[dex]
+        end = self._offsets[dex + 1] if dex + 1 < len(self._offsets) else self._end
+
+        if self._ring is None:
+            return self._data[start:end]
+
+        return self._ring.read(start, end - start)
+
+    def _apply(self: object,
+               grid_obj: object,
+               dex: int) -> int:
+
+        entry = self._read_entry(dex)
+        cells = bytearray(self.cells_of(grid_obj))
+
+        score, position = varint.decode(entry, 0)
+        while position < len(entry):
+            cell, position = varint.decode(entry, position)
+            cells[cell] ^= entry[position]
+            position += 1
+
+        self._set_cells(grid_obj, cells)
+
+        return score
+
+    def undo(self: object,
+             grid_obj: object) -> int or None:
+        'Puts the grid back to before the last move, returns the score that move gained (None if there is none)'
+
+        if not self.can_undo:
+            return None
+
+        self._position -= 1
+
+        return self._apply(grid_obj, self._position)
+
+    def redo(self: object,
+             grid_obj: object) -> int or None:
+        'Plays the last undone move again, returns the score it gained (None if there is none)'
+
+        if not self.can_redo:
+            return None
+
+        self._position += 1
+
+        return self._apply(grid_obj, self._position - 1)
+
+    def stats(self: object) -> dict:
+
+        entries = len(self)
+        data_bytes = self._end - self._offsets[self._first] if entries else 0
+        offset_bytes = self._offsets.itemsize * len(self._offsets)
+
+        return {'entries': entries,
+                'undoable': self._position - self._first,
+                'entry_bytes': data_bytes,
+                'offset_bytes': offset_bytes,
+                'bytes_per_entry': (data_bytes + offset_bytes) / entries if entries else 0.0,
+                'in_memory_bytes': offset_bytes + (len(self._data) if self._ring is None else 0)}
+
+    def close(self: object) -> None:
+
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
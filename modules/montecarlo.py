@@ -0,0 +1,325 @@
+"""
+Pure Monte-Carlo hints: random games to the end after every possible move
+
+Rollouts run in rounds spread over a pool of workers, threads when Python runs without
+the GIL (free-threaded builds) and processes otherwise. After every round the moves
+are compared, and the search stops early once the 95% confidence interval of the best
+mean score no longer overlaps with any other move's
+
+4x4 boards with tiles up to 2**15 play their rollouts on bitboards, any other board on CompactGrid
+"""
+
+import concurrent.futures
+import math
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+import modules.bitboard as bitboard
+import modules.compact as compact
+from modules.grid import SPAWN_CHOICES, SPAWN_RATES
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+_BITBOARD_MOVES = tuple(bitboard.MOVES[direction] for direction in DIRECTIONS)
+
+def free_threaded() -> bool:
+    'Whether this Python runs threads in parallel (3.13t and newer without the GIL)'
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def _ignore_interrupts() -> None:
+
+    # Ctrl-c goes to the whole process group, the game handles it and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _bitboard_rollout(board: int,
+                      direction: int,
+                      rng: random.Random,
+                      tiles: tuple[int],
+                      cum_weights: tuple[float]) -> int:
+
+    board, score = _BITBOARD_MOVES[direction](board)
+
+    while True:
+        # every move that changed the board left at least one empty cell
+        empty_cells = [shift for shift in range(0, 64, 4) if not (board >> shift) & bitboard.CELL_MASK]
+        board |= rng.choices(tiles, cum_weights=cum_weights)[0] << empty_cells[rng.randrange(len(empty_cells))]
+
+        options = []
+        for move in _BITBOARD_MOVES:
+            new_board, gained = move(board)
+            if new_board != board:
+                options.append((new_board, gained))
+        if not options:
+            return score
+
+        board, gained = options[rng.randrange(len(options))]
+        score += gained
+
+def _grid_rollout(grid_obj: compact.CompactGrid,
+                  direction: str,
+                  rng: random.Random,
+                  choices: tuple[int],
+                  rates: tuple[float]) -> int:
+
+    grid_obj.rng = rng
+    score = grid_obj.move(direction)[0]
+
+    while True:
+        grid_obj.spawn_new_numbers(1, choices, rates)
+        moves = grid_obj.available_moves()
+        if not moves:
+            return score
+        score += grid_obj.move(moves[rng.randrange(len(moves))])[0]
+
+def _rollout_batch(state: tuple,
+                   directions: tuple[str],
+                   seconds: float or None,
+                   rollouts: int or None,
+                   seed: int,
+                   spawn_choices: tuple[int],
+                   spawn_rates: tuple[float]) -> dict:
+    """
+    Runs rollouts after each of directions in turn, for about seconds or rollouts per direction
+
+    runs in the workers, so it gets everything by value
+
+    returns {'moves': {direction: [count, total, total of squares]}, 'rollouts', 'seconds', 'worker'}
+    """
+
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    moves = {direction: [0, 0, 0] for direction in directions}
+
+    if state[0] == 'bitboard':
+        board = state[1]
+        tiles = tuple(bitboard.to_exponent(choice) for choice in spawn_choices)
+        cum_weights = tuple(sum(spawn_rates[:dex + 1]) for dex in range(len(spawn_rates)))
+        rollout = lambda direction: _bitboard_rollout(board, DIRECTIONS.index(direction), rng, tiles, cum_weights)
+    else:
+        template = compact.CompactGrid(state[1])
+        template.grid = state[2]
+        rollout = lambda direction: _grid_rollout(template.copy(), direction, rng, spawn_choices, spawn_rates)
+
+    count = 0
+    while True:
+        for direction in directions:
+            score = rollout(direction)
+            result = moves[direction]
+            result[0] += 1
+            result[1] += score
+            result[2] += score * score
+        count += 1
+
+        if rollouts is not None and count >= rollouts:
+            break
+        if seconds is not None and time.perf_counter() - start >= seconds:
+            break
+
+    return {'moves': moves,
+            'rollouts': count * len(directions),
+            'seconds': time.perf_counter() - start,
+            'worker': f'{os.getpid()}-{threading.get_ident()}'}
+
+class MonteCarloPlayer(object):
+    """
+    Picks the move whose random rollouts to game over score best on average
+
+    params:
+        time_budget: seconds per move (None means only max_rollouts limits the search)
+        max_rollouts: rollouts per move to stop at (None means only time_budget limits the search)
+        workers: how many threads or processes run rollouts, defaults to the number of cores
+        confidence: the z value of the confidence intervals for stopping early (1.96 is 95%, 0 never stops early)
+        min_rollouts: rollouts every move needs before stopping early
+        round_seconds: how long the workers run between two comparisons
+        spawn_choices: the numbers that can spawn, like Game._spawn_choices
+        spawn_rates: the weights of spawn_choices, like Game._spawn_rates
+        seed: makes the rollouts reproducible for the same workers and limits
+    """
+
+    def __init__(self: object,
+                 time_budget: float or None=0.25,
+                 max_rollouts: int or None=None,
+                 workers: int or None=None,
+                 confidence: float=1.96,
+                 min_rollouts: int=20,
+                 round_seconds: float=0.02,
+                 spawn_choices: tuple[int]=SPAWN_CHOICES,
+                 spawn_rates: tuple[float]=SPAWN_RATES,
+                 seed: int or None=None) -> None:
+
+        if time_budget is None and max_rollouts is None:
+            raise ValueError('time_budget or max_rollouts needs to be set.')
+        if len(spawn_choices) != len(spawn_rates):
+            raise ValueError('spawn_choices and spawn_rates need to be the same length.')
+
+        self._time_budget = time_budget
+        self._max_rollouts = max_rollouts
+        self._workers = workers or os.cpu_count() or 1
+        self._confidence = confidence
+        self._min_rollouts = min_rollouts
+        self._round_seconds = round_seconds
+        self._spawn_choices = tuple(spawn_choices)
+        self._spawn_rates = tuple(spawn_rates)
+        self._rng = random.Random(seed)
+
+        self.mode = 'threads' if free_threaded() else 'processes'
+        # started the first time it is needed, then kept for the next moves
+        self._pool = None
+
+        self.reset_stats()
+
+    def reset_stats(self: object) -> None:
+
+        self.rollouts = 0
+        self.search_time = 0.0
+        self.searches = 0
+        self.stopped_early = 0
+        # worker -> [rollouts, seconds]
+        self._worker_stats = {}
+        # direction -> (rollouts, mean score) of the last search
+        self.last_means = {}
+
+    def stats(self: object) -> dict:
+
+        return {'mode': self.mode if self._workers > 1 else 'single',
+                'workers': self._workers,
+                'searches': self.searches,
+                'stopped_early': self.stopped_early,
+                'rollouts': self.rollouts,
+                'rollouts_per_second': self.rollouts / self.search_time if self.search_time else 0.0,
+                'rollouts_per_second_per_worker': {worker: rollouts / seconds if seconds else 0.0
+                                                   for worker, (rollouts, seconds) in self._worker_stats.items()},
+                'last_means': dict(self.last_means)}
+
+    def _get_pool(self: object) -> concurrent.futures.Executor:
+
+        if self._pool is None:
+            if self.mode == 'threads':
+                self._pool = concurrent.futures.ThreadPoolExecutor(self._workers)
+            else:
+                self._pool = concurrent.futures.ProcessPoolExecutor(self._workers, initializer=_ignore_interrupts)
+
+        return self._pool
+
+    def close(self: object) -> None:
+
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _separated(self: object,
+                   totals: dict) -> bool:
+        'Whether the best move is ahead of all others with the confidence asked for'
+
+        if not self._confidence:
+            return False
+
+        bounds = []
+        for count, total, squares in totals.values():
+            if count < max(self._min_rollouts, 2):
+                return False
+            mean = total / count
+            variance = max(squares / count - mean * mean, 0.0) * count / (count - 1)
+            half_width = self._confidence * math.sqrt(variance / count)
+            bounds.append((mean - half_width, mean + half_width))
+
+        bounds.sort(key=lambda bound: bound[0] + bound[1])
+        best_lower = bounds[-1][0]
+
+        return all(upper < best_lower for lower, upper in bounds[:-1])
+
+    def best_move(self: object,
+                  board: object) -> str or None:
+        """
+        Finds the move with the best mean rollout score
+
+        params:
+            board: a Grid like object, a grid like Grid.grid or a packed 4x4 bitboard
+
+        returns 'up', 'down', 'left', 'right' or None if there is no move
+        """
+
+        start = time.perf_counter()
+
+        if type(board) == int:
+            state = ('bitboard', board)
+        else:
+            grid = board if type(board) == list else board.grid
+            size = (len(grid[0]), len(grid))
+            try:
+                state = ('bitboard', bitboard.to_board(grid)) if size == (4, 4) else None
+            except ValueError:
+                state = None
+            if state is None:
+                state = ('grid', size, [row[:] for row in grid])
+
+        if state[0] == 'bitboard':
+            directions = tuple(direction for direction, move in zip(DIRECTIONS, _BITBOARD_MOVES)
+                               if move(state[1])[0] != state[1])
+        else:
+            grid_obj = compact.CompactGrid(state[1])
+            grid_obj.grid = state[2]
+            directions = grid_obj.available_moves()
+
+        self.last_means = {}
+        if len(directions) < 2:
+            return directions[0] if directions else None
+
+        totals = {direction: [0, 0, 0] for direction in directions}
+        deadline = start + self._time_budget if self._time_budget is not None else None
+        workers = self._workers
+
+        while True:
+            seconds = None
+            if deadline is not None:
+                seconds = min(self._round_seconds, deadline - time.perf_counter())
+                if seconds <= 0:
+                    break
+
+            rollouts = None
+            if self._max_rollouts is not None:
+                done = min(count for count, total, squares in totals.values())
+                if done >= self._max_rollouts:
+                    break
+                # without a time limit the rounds are a few rollouts each so the intervals get compared
+                per_round = max(self._min_rollouts, 1) if deadline is None else self._max_rollouts
+                rollouts = math.ceil(min(self._max_rollouts - done, per_round) / workers)
+
+            arguments = (state, directions, seconds, rollouts)
+            spawns = (self._spawn_choices, self._spawn_rates)
+            if workers == 1:
+                results = [_rollout_batch(*arguments, self._rng.getrandbits(64), *spawns)]
+            else:
+                pool = self._get_pool()
+                futures = [pool.submit(_rollout_batch, *arguments, self._rng.getrandbits(64), *spawns)
+                           for i in range(workers)]
+                results = [future.result() for future in futures]
+
+            for result in results:
+                for direction, (count, total, squares) in result['moves'].items():
+                    direction_totals = totals[direction]
+                    direction_totals[0] += count
+                    direction_totals[1] += total
+                    direction_totals[2] += squares
+                self.rollouts += result['rollouts']
+                worker_stats = self._worker_stats.setdefault(result['worker'], [0, 0.0])
+                worker_stats[0] += result['rollouts']
+                worker_stats[1] += result['seconds']
+
+            if self._separated(totals):
+                self.stopped_early += 1
+                break
+
+        self.searches += 1
+        self.search_time += time.perf_counter() - start
+        self.last_means = {direction: (count, total / count if count else 0.0)
+                           for direction, (count, total, squares) in totals.items()}
+
+        return max(directions, key=lambda direction: self.last_means[direction][1])
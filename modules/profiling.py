@@ -0,0 +1,212 @@
+"""
+Opt-in timings of the game loop
+
+    profiler = Profiler()
+    with profiler.section('draw_grid'):
+        game._draw_grid()
+    profiler.dump('profile.json')
+
+Every section goes into a histogram with logarithmic buckets (each about 5% wide), so
+a profile of a long game stays small and still gives p50/p95/p99. A disabled profiler
+hands out one shared do-nothing context manager, so leaving the sections in costs next to nothing
+
+A path ending in .prof makes the profiler run cProfile as well and dump its stats
+there instead of the json (open it with pstats or snakeviz)
+"""
+
+import cProfile
+import contextlib
+import json
+import math
+import time
+
+# bucket k holds the timings up to _SMALLEST * _GROWTH**k seconds
+_SMALLEST = 1e-7
+_GROWTH = 1.05
+_LOG_GROWTH = math.log(_GROWTH)
+
+_NULL_SECTION = contextlib.nullcontext()
+
+class Histogram(object):
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self: object) -> None:
+
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self: object,
+            seconds: float) -> None:
+
+        bucket = math.ceil(math.log(seconds / _SMALLEST) / _LOG_GROWTH) if seconds > _SMALLEST else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self: object,
+                   percent: float) -> float:
+        'The upper edge of the bucket the percentile falls in'
+
+        if not self.count:
+            return 0.0
+
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_SMALLEST * _GROWTH**bucket, self.max)
+
+        return self.max
+
+    def summary(self: object) -> dict:
+
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+class _Section(object):
+
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self: object,
+                 histogram: Histogram) -> None:
+
+        self._histogram = histogram
+
+    def __enter__(self: object) -> None:
+
+        self._start = time.perf_counter()
+
+    def __exit__(self: object,
+                 *exc_info) -> None:
+
+        self._histogram.add(time.perf_counter() - self._start)
+
+class Profiler(object):
+    """
+    Records how long named sections take and counts events
+
+    params:
+        enabled: False makes every method do nothing
+        path: where .dump() writes by default, cProfile runs too if it ends in .prof
+    """
+
+    def __init__(self: object,
+                 enabled: bool=True,
+                 path: str or None=None) -> None:
+
+        self.enabled = enabled
+        self.path = path
+
+        self.histograms = {}
+        self.counters = {}
+
+        # name -> (owner, original), put back by .close()
+        self._wrapped = {}
+
+        self._sections = {}
+        self._cprofile = cProfile.Profile() if enabled and path and path.endswith('.prof') else None
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def section(self: object,
+                name: str) -> object:
+        'A context manager that adds the time spent in it to the histogram of name'
+
+        if not self.enabled:
+            return _NULL_SECTION
+
+        section = self._sections.get(name)
+        if section is None:
+            self.histograms[name] = Histogram()
+            section = self._sections[name] = _Section(self.histograms[name])
+
+        return section
+
+    def count(self: object,
+              name: str,
+              amount: int=1) -> None:
+
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_calls(self: object,
+                    owner: object,
+                    attribute: str,
+                    name: str) -> None:
+        """
+        Replaces owner.attribute with a wrapper that counts its calls as name
+
+        Only calls that look the attribute up on owner are counted, not ones made
+        through a reference taken before (from copy import deepcopy)
+        """
+
+        if not self.enabled or name in self._wrapped:
+            return
+
+        original = getattr(owner, attribute)
+        counters = self.counters
+        counters.setdefault(name, 0)
+
+        def wrapper(*args, **kwargs):
+            counters[name] += 1
+            return original(*args, **kwargs)
+
+        setattr(owner, attribute, wrapper)
+        self._wrapped[name] = (owner, attribute, original)
+
+    def summary(self: object) -> dict:
+
+        return {'sections': {name: histogram.summary() for name, histogram in self.histograms.items()},
+                'counters': dict(self.counters)}
+
+    def close(self: object) -> None:
+        'Puts back everything .count_calls() replaced and stops cProfile'
+
+        for owner, attribute, original in self._wrapped.values():
+            setattr(owner, attribute, original)
+        self._wrapped = {}
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def dump(self: object,
+             path: str or None=None) -> None:
+
+        if not self.enabled:
+            return
+
+        self.close()
+
+        path = path or self.path
+        if path is None:
+            return
+
+        if self._cprofile is not None and path.endswith('.prof'):
+            self._cprofile.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='UTF-8') as profile_file:
+                json.dump(self.summary(), profile_file, indent=4)
+
+    def format(self: object) -> str:
+        'The sections as a table in microseconds, and the counters'
+
+        lines = [f'{"section":<20} {"count":>8} {"mean":>9} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9}']
+        for name, histogram in self.histograms.items():
+            summary = histogram.summary()
+            lines.append(f'{name:<20} {summary["count"]:>8} '
+                         + ' '.join(f'{summary[key] * 1e6:>9.1f}' for key in ('mean', 'p50', 'p95', 'p99', 'max')))
+        for name, value in self.counters.items():
+            lines.append(f'{name}: {value}')
+
+        return '\n'.join(lines)
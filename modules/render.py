@@ -0,0 +1,73 @@
+import curses
+
+from modules.utils import addstr_robust
+
+class Renderer(object):
+    """
+    Draws only what changed since the last frame
+
+    Every frame, the game queues all of its strings with .addstr() and then calls .present(),
+    which writes the strings that are new or different, blanks the ones that are gone
+    and pushes everything to the terminal with a single doupdate()
+
+    params:
+        stdscr: the curses window to draw on
+    """
+
+    def __init__(self: object,
+                 stdscr: curses.window) -> None:
+
+        self._stdscr = stdscr
+
+        # (y, x) -> (string, attribute)
+        self._last_frame = {}
+        self._frame = {}
+
+        # how many strings the last .present() call wrote, and in total
+        self.cells_written = 0
+        self.total_cells_written = 0
+
+    def addstr(self: object,
+               y: int,
+               x: int,
+               string: str,
+               attribute: int=0) -> None:
+
+        self._frame[(y, x)] = (string, attribute)
+
+    def invalidate(self: object) -> None:
+        'Clears the window and forgets the last frame, so the next frame is drawn in full (after a resize for example)'
+
+        self._stdscr.erase()
+        self._last_frame = {}
+
+    def present(self: object) -> None:
+
+        last_frame = self._last_frame
+        frame = self._frame
+        written = 0
+
+        # blank out whatever is not drawn anymore first, so it can't wipe something new on top of it
+        for pos, (string, attribute) in last_frame.items():
+            if pos not in frame:
+                addstr_robust(self._stdscr, pos[0], pos[1], ' ' * len(string))
+                written += 1
+
+        for pos, item in frame.items():
+            last_item = last_frame.get(pos)
+            if item != last_item:
+                string, attribute = item
+                # a shorter string needs to cover the end of the longer one that was there
+                if last_item is not None and len(last_item[0]) > len(string):
+                    string += ' ' * (len(last_item[0]) - len(string))
+                addstr_robust(self._stdscr, pos[0], pos[1], string, attribute)
+                written += 1
+
+        self._last_frame = frame
+        self._frame = {}
+
+        self.cells_written = written
+        self.total_cells_written += written
+
+        self._stdscr.noutrefresh()
+        curses.doupdate()
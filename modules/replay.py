@@ -0,0 +1,281 @@
+"""
+Compact binary replays
+
+A replay is a header followed by one byte per move, written as the game is played:
+
+    header: b'2048R', version, seed (8 bytes), length, height,
+            number of spawn choices, the choices (4 bytes each), the weights (8 byte floats)
+    move:   0b0DDCPPPP
+            DD   direction, an index into DIRECTIONS
+            C    which spawn choice appeared after the move
+            PPPP the cell the number appeared on (y * length + x), modulo 16
+    end:    0b10000000 followed by the final score and the number of moves as varints
+
+The seed decides every spawn, so the spawn bits are only a check that the
+re-simulation is still in step with the game that was recorded
+
+usage: python -m modules.replay verify FILE... [--workers N]
+       python -m modules.replay info FILE
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+
+import modules.varint as varint
+
+# the game only needs ReplayWriter, so the engines (bitboard builds its tables on import)
+# and the process pool are imported by the functions that verify replays
+
+MAGIC = b'2048R'
+VERSION = 1
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+_END = 0x80
+
+_HEADER = struct.Struct('<5sBQBBB')
+
+class ReplayWriter(object):
+    """
+    Appends a game to a replay file move by move
+
+    params:
+        path: the file to write
+        seed: the seed of the random.Random the game's grid spawns with
+        size: the grid size
+        spawn_choices: the numbers that can spawn (at most 2)
+        spawn_rates: the weights of spawn_choices
+    """
+
+    def __init__(self: object,
+                 path: str,
+                 seed: int,
+                 size: tuple[int],
+                 spawn_choices: tuple[int],
+                 spawn_rates: tuple[float]) -> None:
+
+        if len(spawn_choices) > 2 or len(spawn_choices) != len(spawn_rates):
+            raise ValueError('replays support at most 2 spawn choices, with one rate each.')
+
+        self._spawn_choices = tuple(spawn_choices)
+        self._moves = 0
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, seed, size[0], size[1], len(spawn_choices))
+                         + struct.pack(f'<{len(spawn_choices)}I', *spawn_choices)
+                         + struct.pack(f'<{len(spawn_rates)}d', *spawn_rates))
+        # a game that is killed keeps every move up to then, flushed moves only need the end record
+        self._file.flush()
+
+    @property
+    def moves(self: object) -> int:
+
+        return self._moves
+
+    def record(self: object,
+               direction: str,
+               spawn_index: int,
+               spawn_value: int) -> None:
+
+        self._file.write(bytes(((DIRECTIONS.index(direction) << 5)
+                                | (self._spawn_choices.index(spawn_value) << 4)
+                                | (spawn_index & 0xF),)))
+        self._file.flush()
+        self._moves += 1
+
+    def close(self: object,
+              score: int) -> None:
+
+        if self._file.closed:
+            return
+
+        self._file.write(bytes((_END,)) + varint.encode(score) + varint.encode(self._moves))
+        self._file.close()
+
+def read_header(replay_file: object) -> dict:
+
+    data = replay_file.read(_HEADER.size)
+    if len(data) != _HEADER.size:
+        raise ValueError('replay is too short to have a header.')
+
+    magic, version, seed, length, height, choice_count = _HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError('not a replay file.')
+    if version != VERSION:
+        raise ValueError(f'replay version {version} is not supported.')
+    if not length or not height or not 1 <= choice_count <= 2:
+        raise ValueError('replay header has a size or spawn choices no game can have.')
+
+    data = replay_file.read(12 * choice_count)
+    if len(data) != 12 * choice_count:
+        raise ValueError('replay ends in the middle of its header.')
+    choices = struct.unpack_from(f'<{choice_count}I', data)
+    rates = struct.unpack_from(f'<{choice_count}d', data, 4 * choice_count)
+
+    return {'seed': seed,
+            'size': (length, height),
+            'spawn_choices': choices,
+            'spawn_rates': rates}
+
+def iter_moves(replay_file: object) -> iter:
+    """
+    Yields the direction of every move of a replay file that is past its header,
+    reading it in blocks, and stops at the end record
+
+    raises ValueError if the replay has no end record
+    """
+
+    while True:
+        block = replay_file.read(65536)
+        if not block:
+            raise ValueError('replay has no end record.')
+
+        for byte in block:
+            if byte & _END:
+                return
+            yield DIRECTIONS[byte >> 5]
+
+def verify_replay(path: str,
+                  engine: str='auto') -> dict:
+    """
+    Plays a replay again and checks it against what was recorded
+
+    params:
+        path: the replay file
+        engine: 'grid', 'bitboard' or 'auto' (bitboard for 4x4 grids)
+
+    returns a dict with 'ok', 'error', 'score', 'moves' and the header (if it could be read)
+    """
+
+    result = {'path': path, 'ok': False, 'error': None, 'score': 0, 'moves': 0}
+
+    # a broken replay is one failed result, it must not stop the others from being verified
+    try:
+        with open(path, 'rb', buffering=65536) as replay_file:
+            return _play_replay(replay_file, result, engine)
+    except (OSError, ValueError) as error:
+        result['error'] = str(error)
+        return result
+
+def _play_replay(replay_file: object,
+                 result: dict,
+                 engine: str) -> dict:
+
+    import modules.bitboard as bitboard
+    import modules.grid as grid
+
+    header = read_header(replay_file)
+    result.update(header)
+    size = header['size']
+    choices = header['spawn_choices']
+    rates = header['spawn_rates']
+
+    use_bitboard = engine == 'bitboard' or (engine == 'auto' and size == (4, 4))
+    rng = random.Random(header['seed'])
+    grid_obj = bitboard.BitboardGrid(size, rng) if use_bitboard else grid.Grid(size, rng)
+
+    grid_obj.reset()
+    grid_obj.spawn_new_numbers(2, choices, rates)
+
+    score = 0
+    moves = 0
+
+    # read in blocks instead of one byte at a time
+    while True:
+        block = replay_file.read(65536)
+        if not block:
+            result.update(score=score, moves=moves, error='replay has no end record.')
+            return result
+
+        for dex, byte in enumerate(block):
+            if byte & _END:
+                # the end record can cross into the next block
+                end = block[dex + 1:dex + 1 + 2 * varint.MAX_SIZE]
+                end += replay_file.read(2 * varint.MAX_SIZE - len(end))
+                recorded_score, position = varint.decode(end)
+                recorded_moves, position = varint.decode(end, position)
+                result.update(score=score, moves=moves)
+                if (recorded_score, recorded_moves) != (score, moves):
+                    result['error'] = (f'recorded score {recorded_score} after {recorded_moves} moves, '
+                                       f'replayed score {score} after {moves} moves.')
+                else:
+                    result['ok'] = True
+                return result
+
+            direction = DIRECTIONS[byte >> 5]
+            gained, moved = grid_obj.move(direction)
+
+            if not moved:
+                result.update(score=score, moves=moves, error=f'move {moves + 1} ({direction}) does nothing.')
+                return result
+
+            x, y, spawn_value = grid_obj.spawn_new_numbers(1, choices, rates)[0]
+            spawn_index = y * size[0] + x
+
+            score += gained
+            moves += 1
+
+            if ((byte >> 4) & 1) != choices.index(spawn_value) or (byte & 0xF) != spawn_index & 0xF:
+                result.update(score=score, moves=moves,
+                              error=f'move {moves} spawned a different number than was recorded.')
+                return result
+
+def verify_replays(paths: list[str],
+                   workers: int or None=None,
+                   engine: str='auto') -> list[dict]:
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [verify_replay(path, engine) for path in paths]
+
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(verify_replay, paths, [engine] * len(paths),
+                                 chunksize=max(1, len(paths) // (workers * 8))))
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m modules.replay', description='Checks 2048 replays.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    verify_parser = subparsers.add_parser('verify', help='play replays again and check their final scores')
+    verify_parser.add_argument('paths', nargs='+')
+    verify_parser.add_argument('--workers', type=int, default=None, help='defaults to the number of cores')
+    verify_parser.add_argument('--engine', choices=('auto', 'grid', 'bitboard'), default='auto')
+
+    info_parser = subparsers.add_parser('info', help='show the header of a replay')
+    info_parser.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        try:
+            with open(args.path, 'rb') as replay_file:
+                header = read_header(replay_file)
+        except (OSError, ValueError) as error:
+            sys.exit(f'{args.path}: {error}')
+        for key, value in header.items():
+            print(f'{key}: {value}')
+        return
+
+    start = time.perf_counter()
+    results = verify_replays(args.paths, args.workers, args.engine)
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if not result['ok']]
+    for result in failed:
+        print(f'{result["path"]}: {result["error"]}')
+
+    print(f'{len(results) - len(failed)}/{len(results)} replays verified in {elapsed:.2f}s '
+          f'({len(results) / elapsed if elapsed else 0.0:.0f} replays/s)')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+
+# the umask can only be read by setting it, so it is read once on import instead of next to other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+class SaveStore(object):
+    """
+    Keeps the save data in memory and writes it to disk in the background
+
+    Changes made with .set() are coalesced: the file is written at most once per delay,
+    on a background thread, and once more by .close(). Every write goes to a temporary
+    file that is then renamed over the save file, so a crash can't leave half a file
+
+    params:
+        path: the save file
+        default: the data to use when there is no save file yet
+        delay: seconds to wait after a change before writing, so a streak of changes is one write
+    """
+
+    def __init__(self: object,
+                 path: str,
+                 default: dict,
+                 delay: float=1.0) -> None:
+
+        self._path = path
+        self._delay = delay
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._dirty = False
+        self._closed = False
+
+        # snapshots are numbered so an older one can never be written over a newer one
+        self._write_lock = threading.Lock()
+        self._snapshot_number = 0
+        self._written_number = 0
+
+        self.writes = 0
+        self.write_time = 0.0
+        self.max_write_time = 0.0
+        # failed background writes, they are tried again after the next delay
+        self.errors = 0
+        self.last_error = None
+
+        try:
+            with open(path, 'r', encoding='UTF-8') as save_file:
+                self._data = json.load(save_file)
+        except FileNotFoundError:
+            self._data = dict(default)
+            self._write(json.dumps(self._data))
+
+        self._thread = threading.Thread(target=self._run, name='save-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def data(self: object) -> dict:
+        'The live save data, change it with .set() so it gets written'
+
+        return self._data
+
+    def set(self: object,
+            key: str,
+            value: object) -> None:
+
+        with self._lock:
+            if self._data.get(key) == value:
+                return
+            self._data[key] = value
+            if not self._dirty:
+                self._dirty = True
+                self._changed.notify()
+
+    def stats(self: object) -> dict:
+
+        return {'writes': self.writes,
+                'write_time': self.write_time,
+                'mean_write_time': self.write_time / self.writes if self.writes else 0.0,
+                'max_write_time': self.max_write_time,
+                'errors': self.errors,
+                'last_error': self.last_error}
+
+    def _write(self: object,
+               text: str) -> None:
+
+        start = time.perf_counter()
+
+        # mkstemp makes the file readable by its owner only, the save keeps the mode it had
+        try:
+            mode = stat.S_IMODE(os.stat(self._path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+
+        directory = os.path.dirname(os.path.abspath(self._path))
+        descriptor, temp_path = tempfile.mkstemp(prefix='.save-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(descriptor, 'w', encoding='UTF-8') as temp_file:
+                os.fchmod(temp_file.fileno(), mode)
+                temp_file.write(text)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self._path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        elapsed = time.perf_counter() - start
+        self.writes += 1
+        self.write_time += elapsed
+        self.max_write_time = max(self.max_write_time, elapsed)
+
+    def _take_snapshot(self: object) -> tuple[int, str] or None:
+
+        # the lock needs to be held by the caller
+        if not self._dirty:
+            return None
+        self._dirty = False
+        self._snapshot_number += 1
+
+        return self._snapshot_number, json.dumps(self._data)
+
+    def _write_snapshot(self: object,
+                        snapshot: tuple[int, str]) -> None:
+
+        with self._write_lock:
+            if snapshot[0] > self._written_number:
+                self._write(snapshot[1])
+                self._written_number = snapshot[0]
+
+    def _run(self: object) -> None:
+
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._changed.wait()
+                # debounce, everything set while waiting ends up in the same write
+                # (only .close() notifies while dirty, so this does not end early otherwise)
+                if not self._closed:
+                    self._changed.wait(self._delay)
+                if self._closed:
+                    return
+                snapshot = self._take_snapshot()
+
+            if snapshot is None:
+                continue
+
+            try:
+                self._write_snapshot(snapshot)
+            except Exception as error:
+                # a full disk must not stop the saves for good, the data is written again after the delay
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = f'{type(error).__name__}: {error}'
+                    self._dirty = True
+
+    def flush(self: object) -> None:
+        'Writes the save data right now if it changed'
+
+        with self._lock:
+            snapshot = self._take_snapshot()
+
+        if snapshot is not None:
+            self._write_snapshot(snapshot)
+
+    def close(self: object) -> None:
+
+        with self._lock:
+            self._closed = True
+            self._changed.notify()
+
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,424 @@
+"""
+Hosts many games from one process over a line based TCP protocol
+
+Every line the client sends is a command, and every command gets exactly one line back:
+
+    new [LENGTH HEIGHT]  ->  session ID LENGTH HEIGHT SCORE CELL...  (a new game, CELL row by row)
+    resume ID            ->  session ID LENGTH HEIGHT SCORE CELL...  (continue a game, from any connection)
+    board                ->  board LENGTH HEIGHT SCORE CELL...
+    move DIRECTION       ->  moved SCORE X,Y,NUMBER...  (only the cells that changed, 0 is empty)
+                             over SCORE X,Y,NUMBER...   (moved, and no move is possible anymore)
+                             unmoved SCORE
+    highscore            ->  highscore HIGHSCORE TILE_HIGHSCORE
+    stats                ->  stats {json}
+    end                  ->  ended ID  (the session is dropped)
+    quit                 ->  the connection is closed, the session stays until it expires
+
+Anything wrong gets 'error MESSAGE' back. Highscores of all sessions go through one
+SaveStore in the same format as the game's save.json
+
+usage: python -m modules.server [--host 127.0.0.1] [--port 2048] [--save save.json]
+                                [--stats-interval 10] [--idle-timeout 3600] [--max-sessions 100000]
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import secrets
+import time
+
+import modules.compact as compact
+from modules.grid import DEFAULT_SIZE, SPAWN_CHOICES, SPAWN_RATES, percentile
+from modules.save import SaveStore
+
+MAX_SIDE = 64
+MAX_LINE = 256
+# a 64x64 session is about 4.5KiB, so this many of them stay under half a GiB
+MAX_SESSIONS = 100000
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+# how many move latencies and seconds of move counts the stats are taken over
+LATENCY_SAMPLES = 10000
+RATE_SECONDS = 10
+
+class Session(object):
+    'One game on the server, slots keep idle sessions small'
+
+    __slots__ = ('grid', 'score', 'last_used', 'connections')
+
+    def __init__(self: object,
+                 size: tuple[int]) -> None:
+
+        self.grid = compact.CompactGrid(size)
+        self.grid.spawn_new_numbers(2, SPAWN_CHOICES, SPAWN_RATES)
+        self.score = 0
+        self.last_used = time.monotonic()
+        self.connections = 0
+
+class GameServer(object):
+    """
+    Owns the sessions and answers commands
+
+    .handle_line() is the whole protocol without any networking, .serve() puts it on a socket
+
+    params:
+        save_path: the save file the highscores are kept in
+        idle_timeout: seconds after which a session without a connection is dropped, None to keep them
+        max_sessions: how many sessions there can be at once, new ones are refused after that
+    """
+
+    def __init__(self: object,
+                 save_path: str='save.json',
+                 idle_timeout: float or None=3600.0,
+                 max_sessions: int=MAX_SESSIONS) -> None:
+
+        self._sessions = {}
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+
+        self._save_store = SaveStore(save_path, {'highscore': 0,
+                                                 'tile_highscore': SPAWN_CHOICES[0]})
+
+        self.connections = 0
+        self.moves = 0
+
+        self._start_time = time.monotonic()
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        # moves per whole second before the current one, with the current one RATE_SECONDS seconds
+        self._move_counts = collections.deque(maxlen=RATE_SECONDS - 1)
+        self._second = int(self._start_time)
+        self._second_moves = 0
+
+    @property
+    def sessions(self: object) -> dict[str, Session]:
+
+        return self._sessions
+
+    def _advance(self: object,
+                 now: float) -> None:
+        'Moves the window of move counts on to the second now is in'
+
+        second = int(now)
+        if second != self._second:
+            self._move_counts.append(self._second_moves)
+            # seconds without any move count too
+            for i in range(min(second - self._second - 1, RATE_SECONDS)):
+                self._move_counts.append(0)
+            self._second = second
+            self._second_moves = 0
+
+    def _count_move(self: object,
+                    latency: float) -> None:
+
+        self._advance(time.monotonic())
+        self._second_moves += 1
+        self.moves += 1
+        self._latencies.append(latency)
+
+    def moves_per_second(self: object) -> float:
+        'Moves per second over the last RATE_SECONDS seconds, the current one counted as far as it has gone'
+
+        now = time.monotonic()
+        self._advance(now)
+
+        # the first second of the window can start before the server did
+        seconds = min(len(self._move_counts) + now - self._second, now - self._start_time)
+        if seconds <= 0:
+            return 0.0
+
+        return (sum(self._move_counts) + self._second_moves) / seconds
+
+    def stats(self: object) -> dict:
+
+        latencies = sorted(self._latencies)
+
+        return {'sessions': len(self._sessions),
+                'connections': self.connections,
+                'moves': self.moves,
+                'moves_per_second': self.moves_per_second(),
+                'p50_latency': percentile(latencies, 50),
+                'p99_latency': percentile(latencies, 99),
+                'uptime': time.monotonic() - self._start_time,
+                'highscore': self._save_store.data['highscore'],
+                'tile_highscore': self._save_store.data['tile_highscore'],
+                'save': self._save_store.stats()}
+
+    def new_session(self: object,
+                    size: tuple[int]=DEFAULT_SIZE) -> str:
+        'Starts a game, raises ValueError when there are already max_sessions sessions'
+
+        if len(self._sessions) >= self._max_sessions:
+            self.expire_sessions()
+            if len(self._sessions) >= self._max_sessions:
+                raise ValueError('the server has too many sessions, try again later.')
+
+        session_id = secrets.token_hex(8)
+        self._sessions[session_id] = Session(size)
+
+        return session_id
+
+    def expire_sessions(self: object) -> int:
+        'Drops the sessions that have been idle for longer than idle_timeout, returns how many'
+
+        if self._idle_timeout is None:
+            return 0
+
+        deadline = time.monotonic() - self._idle_timeout
+        expired = [session_id for session_id, session in self._sessions.items()
+                   if not session.connections and session.last_used < deadline]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+        return len(expired)
+
+    def _board_line(self: object,
+                    kind: str,
+                    session_id: str or None,
+                    session: Session) -> str:
+
+        length, height = session.grid.size
+        words = [kind] if session_id is None else [kind, session_id]
+        words += [str(length), str(height), str(session.score)]
+        words += [str(item) for row in session.grid.grid for item in row]
+
+        return ' '.join(words)
+
+    def _move(self: object,
+              session: Session,
+              direction: str) -> str:
+
+        grid_obj = session.grid
+        before = grid_obj.cells[:]
+
+        gained, moved = grid_obj.move(direction)
+        if not moved:
+            return f'unmoved {session.score}'
+
+        grid_obj.spawn_new_numbers(1, SPAWN_CHOICES, SPAWN_RATES)
+        session.score += gained
+
+        base = grid_obj.base
+        length = grid_obj.size[0]
+        changes = [f'{dex % length},{dex // length},{base**item if item else 0}'
+                   for dex, (item, old_item) in enumerate(zip(grid_obj.cells, before)) if item != old_item]
+
+        # the store only writes when a highscore actually changes
+        save_data = self._save_store.data
+        if session.score > save_data['highscore']:
+            self._save_store.set('highscore', session.score)
+        highest_tile = grid_obj.base**max(grid_obj.cells)
+        if highest_tile > save_data['tile_highscore']:
+            self._save_store.set('tile_highscore', highest_tile)
+
+        kind = 'moved' if grid_obj.can_move() else 'over'
+
+        return ' '.join([kind, str(session.score)] + changes)
+
+    def handle_line(self: object,
+                    connection: dict,
+                    line: str) -> str or None:
+        """
+        Answers one command
+
+        params:
+            connection: the state of the connection, {'session': ID or None}
+            line: the command without the line ending
+
+        returns the answer without the line ending, or None to close the connection
+        """
+
+        words = line.split()
+        if not words:
+            return 'error empty command.'
+        command, arguments = words[0], words[1:]
+
+        if command == 'quit':
+            return None
+
+        if command == 'new':
+            if arguments:
+                try:
+                    size = tuple(int(item) for item in arguments)
+                except ValueError:
+                    return 'error new needs LENGTH HEIGHT as numbers.'
+                if len(size) != 2 or not all(1 <= item <= MAX_SIDE for item in size):
+                    return f'error new needs LENGTH HEIGHT from 1 to {MAX_SIDE}.'
+            else:
+                size = DEFAULT_SIZE
+            try:
+                session_id = self.new_session(size)
+            except ValueError as error:
+                return f'error {error}'
+            return self._attach(connection, session_id)
+
+        if command == 'resume':
+            if len(arguments) != 1 or arguments[0] not in self._sessions:
+                return 'error no such session.'
+            return self._attach(connection, arguments[0])
+
+        if command == 'highscore':
+            save_data = self._save_store.data
+            return f'highscore {save_data["highscore"]} {save_data["tile_highscore"]}'
+
+        if command == 'stats':
+            return f'stats {json.dumps(self.stats())}'
+
+        session_id = connection['session']
+        session = self._sessions.get(session_id)
+        if session is None:
+            return 'error no session, send new or resume first.'
+        session.last_used = time.monotonic()
+
+        if command == 'move':
+            if len(arguments) != 1 or arguments[0] not in DIRECTIONS:
+                return 'error move needs one of up, down, left or right.'
+            start = time.perf_counter()
+            answer = self._move(session, arguments[0])
+            self._count_move(time.perf_counter() - start)
+            return answer
+
+        if command == 'board':
+            return self._board_line('board', None, session)
+
+        if command == 'end':
+            self._detach(connection)
+            del self._sessions[session_id]
+            return f'ended {session_id}'
+
+        return f'error unknown command {command}.'
+
+    def _attach(self: object,
+                connection: dict,
+                session_id: str) -> str:
+
+        self._detach(connection)
+        session = self._sessions[session_id]
+        session.connections += 1
+        session.last_used = time.monotonic()
+        connection['session'] = session_id
+
+        return self._board_line('session', session_id, session)
+
+    def _detach(self: object,
+                connection: dict) -> None:
+
+        session = self._sessions.get(connection['session'])
+        if session is not None:
+            session.connections -= 1
+            session.last_used = time.monotonic()
+        connection['session'] = None
+
+    async def _handle_connection(self: object,
+                                 reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+
+        connection = {'session': None}
+        self.connections += 1
+
+        try:
+            while True:
+                try:
+                    data = await reader.readline()
+                except ValueError:
+                    # the line was longer than MAX_LINE, the rest of it can't be trusted
+                    writer.write(b'error line too long.\n')
+                    break
+                if not data:
+                    break
+
+                try:
+                    answer = self.handle_line(connection, data.decode('UTF-8').strip())
+                except UnicodeDecodeError:
+                    answer = 'error commands need to be UTF-8.'
+                if answer is None:
+                    break
+
+                writer.write(answer.encode('UTF-8') + b'\n')
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            self._detach(connection)
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _housekeeping(self: object,
+                            stats_interval: float or None) -> None:
+
+        interval = min(item for item in (stats_interval, self._idle_timeout, 60.0) if item)
+        last_stats = time.monotonic()
+
+        while True:
+            await asyncio.sleep(interval)
+            self.expire_sessions()
+
+            if stats_interval and time.monotonic() - last_stats >= stats_interval:
+                last_stats = time.monotonic()
+                stats = self.stats()
+                print(f'{stats["sessions"]} sessions, {stats["connections"]} connections, '
+                      f'{stats["moves_per_second"]:.0f} moves/s, '
+                      f'p99 move latency {stats["p99_latency"] * 1e6:.0f}us', flush=True)
+
+    async def serve(self: object,
+                    host: str='127.0.0.1',
+                    port: int=2048,
+                    stats_interval: float or None=None,
+                    started: asyncio.Event or None=None) -> None:
+        """
+        Serves until cancelled, then writes the highscores one last time
+
+        params:
+            host: the address to listen on
+            port: the port to listen on, 0 picks a free one (see .port)
+            stats_interval: seconds between stats lines on stdout, None for none
+            started: set once the server is listening
+        """
+
+        server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_LINE)
+        self.port = server.sockets[0].getsockname()[1]
+        housekeeping = asyncio.create_task(self._housekeeping(stats_interval))
+
+        if started is not None:
+            started.set()
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            housekeeping.cancel()
+            self._save_store.close()
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m modules.server',
+                                     description='Hosts many games of 2048 over TCP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2048)
+    parser.add_argument('--save', default='save.json', help='the file the highscores are kept in')
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help='seconds between stats lines, 0 for none')
+    parser.add_argument('--idle-timeout', type=float, default=3600.0,
+                        help='seconds before a session without a connection is dropped, 0 to keep them')
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS,
+                        help='sessions at once, new ones are refused after that')
+    args = parser.parse_args(argv)
+
+    game_server = GameServer(args.save, args.idle_timeout or None, args.max_sessions)
+    print(f'serving on {args.host}:{args.port}', flush=True)
+
+    try:
+        asyncio.run(game_server.serve(args.host, args.port, args.stats_interval or None))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
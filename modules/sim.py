@@ -0,0 +1,275 @@
+"""
+Headless batch simulation of games without curses
+
+usage: python -m modules.sim --games 100000 --policy random --workers 4
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import time
+
+import modules.bitboard as bitboard
+import modules.compact as compact
+import modules.grid as grid
+import modules.sparse as sparse
+from modules.grid import percentile
+
+def random_policy(grid_obj: grid.Grid,
+                  moves: tuple[str],
+                  spawn_choices: tuple[int],
+                  spawn_rates: tuple[float]) -> str:
+
+    return random.choice(moves)
+
+# one player per process (and spawn settings) so its transposition table is reused across the games of a chunk
+_expectimax_players = {}
+
+def expectimax_policy(grid_obj: grid.Grid or bitboard.BitboardGrid,
+                      moves: tuple[str],
+                      spawn_choices: tuple[int],
+                      spawn_rates: tuple[float]) -> str:
+
+    player = _expectimax_players.get((spawn_choices, spawn_rates))
+    if player is None:
+        # imported here so workers of the other policies don't build the search tables
+        import modules.ai as ai
+        # the search needs to expect the spawns the games really have
+        player = _expectimax_players[(spawn_choices, spawn_rates)] = ai.ExpectimaxPlayer(
+            spawn_choices=spawn_choices, spawn_rates=spawn_rates)
+
+    if isinstance(grid_obj, bitboard.BitboardGrid):
+        return player.best_move(grid_obj.board)
+
+    return player.best_move(grid_obj.grid)
+
+_montecarlo_players = {}
+
+def montecarlo_policy(grid_obj: grid.Grid or bitboard.BitboardGrid,
+                      moves: tuple[str],
+                      spawn_choices: tuple[int],
+                      spawn_rates: tuple[float]) -> str:
+
+    player = _montecarlo_players.get((spawn_choices, spawn_rates))
+    if player is None:
+        import modules.montecarlo as montecarlo
+        # the games are already spread over the processes, so the rollouts stay in this one
+        # and they spawn what the games spawn
+        player = _montecarlo_players[(spawn_choices, spawn_rates)] = montecarlo.MonteCarloPlayer(
+            time_budget=None, max_rollouts=10, workers=1, spawn_choices=spawn_choices,
+            spawn_rates=spawn_rates, seed=random.getrandbits(64))
+
+    if isinstance(grid_obj, bitboard.BitboardGrid):
+        return player.best_move(grid_obj.board)
+
+    return player.best_move(grid_obj)
+
+# a policy gets the grid, its available moves (never empty) and the spawn settings of the game
+# and returns the direction to play
+POLICIES = {'random': random_policy,
+            'expectimax': expectimax_policy,
+            'montecarlo': montecarlo_policy}
+
+ENGINES = {'grid': grid.Grid,
+           'bitboard': bitboard.BitboardGrid,
+           'compact': compact.CompactGrid,
+           'sparse': sparse.SparseGrid}
+
+# the engines and policies that keep tiles as exponents of 2, the bitboard ones 4 bits each
+EXPONENT_ENGINES = ('bitboard', 'compact')
+EXPONENT_POLICIES = ('expectimax', 'montecarlo')
+# the spawn choices all of them can hold
+EXPONENT_CHOICES = tuple(2**exponent for exponent in range(1, bitboard.MAX_EXPONENT + 1))
+
+def play_game(grid_obj: grid.Grid or bitboard.BitboardGrid,
+              policy: callable,
+              spawn_choices: tuple[int]=grid.SPAWN_CHOICES,
+              spawn_rates: tuple[float]=grid.SPAWN_RATES) -> tuple[int]:
+    """
+    Plays one game until no move is possible
+
+    returns (score, highest tile, number of moves)
+    """
+
+    grid_obj.reset()
+    grid_obj.spawn_new_numbers(2, spawn_choices, spawn_rates)
+
+    score = 0
+    move_count = 0
+
+    while True:
+        moves = grid_obj.available_moves()
+        if not moves:
+            break
+
+        score += grid_obj.move(policy(grid_obj, moves, spawn_choices, spawn_rates))[0]
+        # every available move changes the grid, so there is always a new number
+        grid_obj.spawn_new_numbers(1, spawn_choices, spawn_rates)
+        move_count += 1
+
+    return score, max(max(row) for row in grid_obj.grid), move_count
+
+def _play_chunk(games: int,
+                seed: int or None,
+                policy_name: str,
+                engine_name: str,
+                size: tuple[int],
+                spawn_choices: tuple[int],
+                spawn_rates: tuple[float]) -> dict:
+
+    # runs inside the worker processes, so everything it needs is passed by name
+    random.seed(seed)
+
+    grid_obj = ENGINES[engine_name](size)
+    policy = POLICIES[policy_name]
+
+    scores = []
+    move_counts = []
+    max_tiles = collections.Counter()
+
+    for i in range(games):
+        score, max_tile, move_count = play_game(grid_obj, policy, spawn_choices, spawn_rates)
+        scores.append(score)
+        move_counts.append(move_count)
+        max_tiles[max_tile] += 1
+
+    return {'scores': scores, 'moves': move_counts, 'max_tiles': max_tiles}
+
+def run(games: int,
+        policy: str='random',
+        workers: int or None=None,
+        size: tuple[int]=grid.DEFAULT_SIZE,
+        spawn_choices: tuple[int]=grid.SPAWN_CHOICES,
+        spawn_rates: tuple[float]=grid.SPAWN_RATES,
+        engine: str='grid',
+        seed: int or None=None) -> dict:
+    """
+    Plays many games across a process pool and aggregates the results
+
+    params:
+        games: how many games to play
+        policy: a key of POLICIES
+        workers: number of processes, defaults to the number of cores
+        size: the grid size
+        spawn_choices: the numbers that can spawn
+        spawn_rates: the weights of spawn_choices
+        engine: a key of ENGINES ('bitboard' only supports 4x4)
+        seed: makes the run reproducible for the same number of workers
+    """
+
+    if type(games) != int or games < 1:
+        raise ValueError('games needs to be an int of at least 1.')
+    if policy not in POLICIES:
+        raise ValueError(f'policy needs to be one of {", ".join(POLICIES)}.')
+    if engine not in ENGINES:
+        raise ValueError(f'engine needs to be one of {", ".join(ENGINES)}.')
+    if policy == 'expectimax' and tuple(size) != (4, 4):
+        raise ValueError('the expectimax policy only plays 4x4 grids.')
+    if engine == 'bitboard' and tuple(size) != (4, 4):
+        raise ValueError('the bitboard engine only plays 4x4 grids.')
+    if engine in EXPONENT_ENGINES or policy in EXPONENT_POLICIES:
+        for choice in spawn_choices:
+            if choice not in EXPONENT_CHOICES:
+                raise ValueError(f'the {engine} engine with the {policy} policy can not spawn {choice}, '
+                                 f'spawn choices need to be powers of 2 from 2 to {EXPONENT_CHOICES[-1]}.')
+
+    workers = workers or os.cpu_count() or 1
+
+    # a few chunks per worker so a slow chunk does not leave the other cores idle
+    chunk_count = max(1, min(games, workers * 4))
+    chunk_sizes = [games // chunk_count + (i < games % chunk_count) for i in range(chunk_count)]
+    seeds = [None if seed is None else seed * 1000003 + i for i in range(chunk_count)]
+
+    arguments = (policy, engine, size, tuple(spawn_choices), tuple(spawn_rates))
+
+    start = time.perf_counter()
+
+    if workers == 1:
+        results = [_play_chunk(chunk_size, chunk_seed, *arguments)
+                   for chunk_size, chunk_seed in zip(chunk_sizes, seeds)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(_play_chunk, chunk_size, chunk_seed, *arguments)
+                       for chunk_size, chunk_seed in zip(chunk_sizes, seeds)]
+            results = [future.result() for future in futures]
+
+    elapsed = time.perf_counter() - start
+
+    scores = sorted(score for result in results for score in result['scores'])
+    move_counts = sorted(moves for result in results for moves in result['moves'])
+    max_tiles = collections.Counter()
+    for result in results:
+        max_tiles.update(result['max_tiles'])
+
+    return {'games': games,
+            'workers': workers,
+            'policy': policy,
+            'engine': engine,
+            'seconds': elapsed,
+            'games_per_second': games / elapsed if elapsed else 0.0,
+            'score': {'min': scores[0],
+                      'mean': sum(scores) / games,
+                      'p10': percentile(scores, 10),
+                      'p50': percentile(scores, 50),
+                      'p90': percentile(scores, 90),
+                      'p99': percentile(scores, 99),
+                      'max': scores[-1]},
+            'moves': {'min': move_counts[0],
+                      'mean': sum(move_counts) / games,
+                      'p50': percentile(move_counts, 50),
+                      'max': move_counts[-1]},
+            'max_tiles': dict(sorted(max_tiles.items()))}
+
+def _print_stats(stats: dict) -> None:
+
+    print(f'{stats["games"]} games, policy {stats["policy"]}, engine {stats["engine"]}, '
+          f'{stats["workers"]} workers')
+    print(f'{stats["seconds"]:.2f}s ({stats["games_per_second"]:.1f} games/s)')
+    print('score: ' + ', '.join(f'{key} {value:.0f}' for key, value in stats['score'].items()))
+    print('moves: ' + ', '.join(f'{key} {value:.0f}' for key, value in stats['moves'].items()))
+    print('max tile:')
+    for tile, count in stats['max_tiles'].items():
+        print(f' - {tile:>6}: {count:>8} ({count / stats["games"]:6.2%})')
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m modules.sim',
+                                     description='Plays many games of 2048 without a terminal.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--policy', choices=tuple(POLICIES), default='random')
+    parser.add_argument('--workers', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--size', type=int, nargs=2, default=grid.DEFAULT_SIZE, metavar=('LENGTH', 'HEIGHT'))
+    parser.add_argument('--spawn-choices', type=int, nargs='+', default=grid.SPAWN_CHOICES)
+    parser.add_argument('--spawn-rates', type=float, nargs='+', default=grid.SPAWN_RATES)
+    parser.add_argument('--engine', choices=tuple(ENGINES), default='grid')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the stats as json')
+    args = parser.parse_args(argv)
+
+    if args.games < 1:
+        parser.error('--games needs to be at least 1.')
+    if len(args.spawn_choices) != len(args.spawn_rates):
+        parser.error('--spawn-choices and --spawn-rates need the same number of values.')
+    if args.policy == 'expectimax' and tuple(args.size) != (4, 4):
+        parser.error('--policy expectimax only plays --size 4 4.')
+    if args.engine == 'bitboard' and tuple(args.size) != (4, 4):
+        parser.error('--engine bitboard only plays --size 4 4.')
+    if ((args.engine in EXPONENT_ENGINES or args.policy in EXPONENT_POLICIES)
+        and any(choice not in EXPONENT_CHOICES for choice in args.spawn_choices)):
+        parser.error(f'--engine {args.engine} with --policy {args.policy} needs --spawn-choices '
+                     f'that are powers of 2 from 2 to {EXPONENT_CHOICES[-1]}.')
+
+    stats = run(args.games, args.policy, args.workers, tuple(args.size),
+                args.spawn_choices, args.spawn_rates, args.engine, args.seed)
+
+    if args.json:
+        print(json.dumps(stats, indent=4))
+    else:
+        _print_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
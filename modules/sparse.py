@@ -0,0 +1,304 @@
+import random
+
+class SparseGrid(object):
+    """
+    A Grid for very large boards that only stores the tiles
+
+    Tiles live in a dict of cell -> number (cell is y * length + x), so moves cost
+    proportional to the number of tiles instead of the number of cells. The empty
+    cells are kept in an array with a position index next to it, updated by every
+    move, so spawning a number is O(1)
+
+    It has the same methods as modules.grid.Grid, but spawns from its free cell array,
+    so the same seed does not give the same spawns as Grid (replays need Grid)
+
+    params:
+        size: tuple[int length, int height]
+        rng: the random number generator to spawn with (the random module by default)
+    """
+
+    def __init__(self: object,
+                 size: tuple,
+                 rng: random.Random or None=None):
+
+        self._check_size(size)
+
+        self._size = size
+        self._rng = rng if rng is not None else random
+        self._tiles = {}
+        self._reset_free_cells()
+
+    def _check_size(self: object,
+                    value: tuple[int]) -> None:
+
+        if type(value) != tuple or len(value) != 2:
+            raise ValueError('size needs to be tuple[int length, int height].')
+        for item in value:
+            if type(item) != int:
+                raise ValueError('size needs to be tuple[int length, int height].')
+            elif item <= 0:
+                raise ValueError('size needs to be at least tuple[1, 1].')
+
+    def _reset_free_cells(self: object) -> None:
+
+        # _free holds every empty cell, _free_dex[cell] is where it is in _free (-1 if it has a tile)
+        cell_count = self._size[0] * self._size[1]
+        self._free = [cell for cell in range(cell_count) if cell not in self._tiles]
+        self._free_dex = [-1] * cell_count
+        for dex, cell in enumerate(self._free):
+            self._free_dex[cell] = dex
+
+    def _add_free(self: object,
+                  cell: int) -> None:
+
+        self._free_dex[cell] = len(self._free)
+        self._free.append(cell)
+
+    def _remove_free(self: object,
+                     cell: int) -> None:
+
+        # swap with the last free cell and pop, so nothing has to shift
+        dex = self._free_dex[cell]
+        last = self._free[-1]
+        self._free[dex] = last
+        self._free_dex[last] = dex
+        self._free.pop()
+        self._free_dex[cell] = -1
+
+    @property
+    def tiles(self: object) -> dict[int, int]:
+        'cell (y * length + x) -> number, for every tile on the grid'
+
+        return self._tiles
+
+    @property
+    def grid(self: object) -> list[list[int]]:
+
+        length = self._size[0]
+        grid = [[0] * length for y in range(self._size[1])]
+        for cell, item in self._tiles.items():
+            grid[cell // length][cell % length] = item
+
+        return grid
+
+    @grid.setter
+    def grid(self: object,
+             value: list[list[int]]) -> None:
+
+        if type(value) != list:
+            raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+        for row in value:
+            if type(row) != list:
+                raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+            if (len(row), len(value)) != self._size:
+                raise ValueError('new grid needs to be the same size as was last set ' \
+                                 'and the length of all rows should be the same.')
+            for item in row:
+                if type(item) != int:
+                    raise ValueError('grid needs to be [list row[int number], list row[int number]...].')
+
+        length = self._size[0]
+        self._tiles = {y * length + x: item for y, row in enumerate(value) for x, item in enumerate(row) if item}
+        self._reset_free_cells()
+
+    @property
+    def rng(self: object) -> random.Random:
+
+        return self._rng
+
+    @rng.setter
+    def rng(self: object,
+            value: random.Random or None) -> None:
+
+        self._rng = value if value is not None else random
+
+    @property
+    def size(self: object) -> tuple[int]:
+
+        return self._size
+
+    @size.setter
+    def size(self: object,
+             value: tuple[int]) -> None:
+
+        self._check_size(value)
+
+        # like Grid, tiles outside of the new size are cut off
+        old_length = self._size[0]
+        self._tiles = {(cell // old_length) * value[0] + cell % old_length: item
+                       for cell, item in self._tiles.items()
+                       if cell % old_length < value[0] and cell // old_length < value[1]}
+        self._size = value
+        self._reset_free_cells()
+
+    def reset(self: object) -> None:
+
+        self._tiles = {}
+        self._reset_free_cells()
+
+    def available_moves(self: object) -> tuple[str]:
+
+        length, height = self._size
+        tiles = self._tiles
+
+        up = down = left = right = False
+
+        for cell, item in tiles.items():
+            x = cell % length
+            # a tile can move towards a neighbour cell that is empty or has the same number
+            # (tiles.get() gives back the tile's own number for an empty cell, so both are one check)
+            if x and tiles.get(cell - 1, item) == item:
+                left = True
+            if x + 1 < length and tiles.get(cell + 1, item) == item:
+                right = True
+            if cell >= length and tiles.get(cell - length, item) == item:
+                up = True
+            if cell + length < length * height and tiles.get(cell + length, item) == item:
+                down = True
+
+            if up and down and left and right:
+                break
+
+        return tuple(direction for direction, possible
+                     in (('up', up), ('down', down), ('left', left), ('right', right)) if possible)
+
+    def can_move(self: object) -> bool:
+
+        if self._free:
+            return bool(self._tiles)
+
+        length = self._size[0]
+        tiles = self._tiles
+        for cell, item in tiles.items():
+            if (cell % length + 1 < length and tiles[cell + 1] == item
+                or tiles.get(cell + length) == item):
+                return True
+
+        return False
+
+    def spawn_new_numbers(self: object,
+                          count: int,
+                          choices: list or tuple[int],
+                          weights: list or tuple[float] or None=None) -> list[tuple[int]]:
+        'Returns the spawned numbers as [(x, y, number)...]'
+
+        spawned = []
+        length = self._size[0]
+
+        for i in range(min(count, len(self._free))):
+            cell = self._free[self._rng.randrange(0, len(self._free))]
+            self._remove_free(cell)
+
+            value = self._rng.choices(choices, weights, k=1)[0]
+            self._tiles[cell] = value
+            spawned.append((cell % length, cell // length, value))
+
+        return spawned
+
+    def _move_tiles(self: object,
+                    direction: str) -> tuple[dict, int]:
+
+        length, height = self._size
+
+        # cell = line * line_step + position * position_step
+        horizontal = direction in ('left', 'right')
+        if horizontal:
+            line_step, position_step, line_length = length, 1, length
+        elif direction in ('up', 'down'):
+            line_step, position_step, line_length = 1, length, height
+        else:
+            raise ValueError('direction needs to be one of \'up\', \'down\', \'left\' or \'right\'.')
+        towards_end = direction in ('right', 'down')
+
+        lines = {}
+        for cell, item in self._tiles.items():
+            if horizontal:
+                line, position = divmod(cell, length)
+            else:
+                position, line = divmod(cell, length)
+            lines.setdefault(line, []).append((position, item))
+
+        new_tiles = {}
+        score = 0
+        for line, items in lines.items():
+            items.sort(reverse=towards_end)
+
+            # the same compress-merge as Grid, only over the tiles of the line
+            merged = []
+            last_combinable = False
+            for position, item in items:
+                if last_combinable and merged[-1] == item:
+                    merged[-1] = item * 2
+                    score += item * 2
+                    last_combinable = False
+                else:
+                    merged.append(item)
+                    last_combinable = True
+
+            start = line * line_step
+            for dex, item in enumerate(merged):
+                position = line_length - 1 - dex if towards_end else dex
+                new_tiles[start + position * position_step] = item
+
+        return new_tiles, score
+
+    def move(self: object,
+             direction: str) -> tuple[int, bool]:
+        """
+        Moves the grid in place
+
+        params:
+            direction: one of 'up', 'down', 'left' or 'right'
+
+        returns (score, whether anything moved)
+        """
+
+        old_tiles = self._tiles
+        new_tiles, score = self._move_tiles(direction)
+        if new_tiles == old_tiles:
+            return score, False
+
+        # only the cells that had or now have a tile can change between free and taken
+        for cell in old_tiles:
+            if cell not in new_tiles:
+                self._add_free(cell)
+        for cell in new_tiles:
+            if cell not in old_tiles:
+                self._remove_free(cell)
+
+        self._tiles = new_tiles
+
+        return score, True
+
+    def _copy_and_move(self: object,
+                       direction: str,
+                       return_score: int) -> list or tuple:
+
+        new_tiles, score = self._move_tiles(direction)
+
+        length = self._size[0]
+        return_grid = [[0] * length for y in range(self._size[1])]
+        for cell, item in new_tiles.items():
+            return_grid[cell // length][cell % length] = item
+
+        return (return_grid, score) if return_score else return_grid
+
+    def up(self: object,
+           return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('up', return_score)
+
+    def down(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('down', return_score)
+
+    def left(self: object,
+             return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('left', return_score)
+
+    def right(self: object,
+              return_score: int=0) -> list or tuple:
+
+        return self._copy_and_move('right', return_score)
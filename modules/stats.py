@@ -0,0 +1,418 @@
+"""
+Streaming statistics over archived games
+
+Game records are read lazily, one at a time, from two kinds of files:
+
+    .jsonl   one json object per line, with 'score', 'moves' and 'board' (like Grid.grid)
+             or 'max_tile', and optionally 'seed' and 'moves_to_win'
+    .2048r   replays (see modules/replay.py), played again with modules.grid.Grid
+
+Everything they add up to has a fixed size however many games go in: quantile sketches
+for the scores, moves and moves to the winning tile, and counters of the highest tiles.
+Large json-lines files are split into byte ranges so several processes can read one
+file, and the stats of every process are merged at the end
+
+usage: python -m modules.stats FILE... [--workers N] [--win-tile 2048] [--json]
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import modules.grid as grid
+import modules.replay as replay
+from modules.grid import SPAWN_CHOICES, WIN_TILE
+
+class QuantileSketch(object):
+    """
+    Approximate quantiles of positive numbers in a fixed amount of memory
+
+    Values are counted in logarithmic buckets, so every quantile is within relative_accuracy
+    of a value that was added. Two sketches with the same accuracy merge by adding their counts
+
+    params:
+        relative_accuracy: how far off a quantile can be, as a fraction of it
+    """
+
+    def __init__(self: object,
+                 relative_accuracy: float=0.01) -> None:
+
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        self.buckets = collections.Counter()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self: object,
+            value: float) -> None:
+
+        if value < 0:
+            raise ValueError('QuantileSketch only takes values of 0 and up.')
+
+        if value:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+        else:
+            self.zeros += 1
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self: object,
+              other: object) -> None:
+
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('only sketches with the same relative_accuracy can be merged.')
+
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self: object,
+                 fraction: float) -> float or None:
+
+        if not self.count:
+            return None
+
+        rank = fraction * (self.count - 1)
+        if rank < self.zeros:
+            return 0
+
+        seen = self.zeros
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                # the middle of the bucket, in relative terms
+                value = 2 * self._gamma**bucket / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+    def summary(self: object) -> dict:
+
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'p10': self.quantile(0.1),
+                'p50': self.quantile(0.5),
+                'p90': self.quantile(0.9),
+                'p99': self.quantile(0.99),
+                'max': self.max}
+
+class GameStats(object):
+    """
+    Running aggregates over game records, merged across processes with .merge()
+
+    highscore and tile_highscore mean the same as in save.json: the best score of any
+    game and the highest tile of any game (at least the smallest spawn, like a new save)
+
+    params:
+        win_tile: the tile that wins a game, for the moves to win distribution
+        relative_accuracy: of the quantile sketches
+    """
+
+    def __init__(self: object,
+                 win_tile: int=WIN_TILE,
+                 relative_accuracy: float=0.01) -> None:
+
+        self.win_tile = win_tile
+
+        self.games = 0
+        self.highscore = 0
+        self.tile_highscore = SPAWN_CHOICES[0]
+        self.scores = QuantileSketch(relative_accuracy)
+        self.moves = QuantileSketch(relative_accuracy)
+        self.moves_to_win = QuantileSketch(relative_accuracy)
+        self.max_tiles = collections.Counter()
+        # records that could not be read or added, they are left out of everything else
+        self.errors = 0
+        self.last_error = None
+
+    def add(self: object,
+            record: dict) -> None:
+        'Adds a game, raises ValueError (and leaves the stats as they were) if the record is broken'
+
+        try:
+            max_tile = record.get('max_tile')
+            if max_tile is None:
+                max_tile = max(max(row) for row in record['board'])
+            score = record['score']
+            moves = record['moves']
+            moves_to_win = record.get('moves_to_win')
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            raise ValueError(f'record is missing a score, moves or board ({error!r}).') from None
+
+        for value in (score, moves, max_tile) + ((moves_to_win,) if moves_to_win is not None else ()):
+            if type(value) not in (int, float) or value < 0:
+                raise ValueError(f'record has {value!r} where a number of 0 and up belongs.')
+
+        self.games += 1
+        self.scores.add(score)
+        self.moves.add(moves)
+        self.max_tiles[max_tile] += 1
+
+        if moves_to_win is not None:
+            self.moves_to_win.add(moves_to_win)
+
+        if score > self.highscore:
+            self.highscore = score
+        if max_tile > self.tile_highscore:
+            self.tile_highscore = max_tile
+
+    def add_error(self: object,
+                  error: str) -> None:
+        'Counts a record that could not be read'
+
+        self.errors += 1
+        self.last_error = error
+
+    def merge(self: object,
+              other: object) -> None:
+
+        self.games += other.games
+        self.highscore = max(self.highscore, other.highscore)
+        self.tile_highscore = max(self.tile_highscore, other.tile_highscore)
+        self.scores.merge(other.scores)
+        self.moves.merge(other.moves)
+        self.moves_to_win.merge(other.moves_to_win)
+        self.max_tiles.update(other.max_tiles)
+        self.errors += other.errors
+        if other.last_error is not None:
+            self.last_error = other.last_error
+
+    def summary(self: object) -> dict:
+
+        return {'games': self.games,
+                'highscore': self.highscore,
+                'tile_highscore': self.tile_highscore,
+                'score': self.scores.summary(),
+                'moves': self.moves.summary(),
+                'won': self.moves_to_win.count,
+                'moves_to_win': self.moves_to_win.summary(),
+                'max_tiles': dict(sorted(self.max_tiles.items())),
+                'errors': self.errors,
+                'last_error': self.last_error}
+
+def read_jsonl(path: str,
+               start: int=0,
+               end: int or None=None,
+               on_error: callable or None=None) -> iter:
+    """
+    Yields the records of a json-lines file one line at a time
+
+    params:
+        path: the file
+        start, end: only the lines that start in this byte range (a line that starts
+                    before start belongs to the range before), for splitting a file up
+        on_error: called with a message for every line that is not json, which is then skipped
+                  (None raises ValueError instead)
+    """
+
+    with open(path, 'rb') as records_file:
+        if start:
+            # the line start is in is read by the range before this one
+            records_file.seek(start - 1)
+            records_file.readline()
+
+        while end is None or records_file.tell() < end:
+            line = records_file.readline()
+            if not line:
+                return
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as error:
+                    if on_error is None:
+                        raise
+                    on_error(f'{path}: {error}')
+                    continue
+                yield record
+
+def replay_record(path: str,
+                  win_tile: int=WIN_TILE) -> dict:
+    'Plays a replay again with Grid and returns its record'
+
+    with open(path, 'rb', buffering=65536) as replay_file:
+        header = replay.read_header(replay_file)
+        choices = header['spawn_choices']
+        rates = header['spawn_rates']
+
+        grid_obj = grid.Grid(header['size'], random.Random(header['seed']))
+        grid_obj.reset()
+        grid_obj.spawn_new_numbers(2, choices, rates)
+
+        score = 0
+        moves = 0
+        moves_to_win = None
+
+        for direction in replay.iter_moves(replay_file):
+            gained, moved = grid_obj.move(direction)
+            if not moved:
+                raise ValueError(f'move {moves + 1} ({direction}) does nothing.')
+            grid_obj.spawn_new_numbers(1, choices, rates)
+
+            score += gained
+            moves += 1
+            # only a move that scored at least win_tile can have made it
+            if moves_to_win is None and gained >= win_tile and max(max(row) for row in grid_obj.grid) >= win_tile:
+                moves_to_win = moves
+
+    return {'score': score,
+            'moves': moves,
+            'board': grid_obj.grid,
+            'seed': header['seed'],
+            'moves_to_win': moves_to_win}
+
+def read_records(path: str,
+                 start: int=0,
+                 end: int or None=None,
+                 win_tile: int=WIN_TILE,
+                 on_error: callable or None=None) -> iter:
+    """
+    Yields the records of a .jsonl file (from start to end) or the one record of a replay
+
+    on_error is called with a message for every line or replay that can't be read,
+    which is then skipped (None raises ValueError instead)
+    """
+
+    if not path.endswith('.2048r'):
+        yield from read_jsonl(path, start, end, on_error)
+        return
+
+    # a replay without an end record is a game that is still running or crashed
+    try:
+        record = replay_record(path, win_tile)
+    except ValueError as error:
+        if on_error is None:
+            raise
+        on_error(f'{path}: {error}')
+        return
+    yield record
+
+def _collect_shard(shard: tuple,
+                   win_tile: int) -> GameStats:
+
+    # runs inside the worker processes
+    # every broken record is counted and skipped, one of them must not lose all the others
+    stats = GameStats(win_tile)
+    for path, start, end in shard:
+        try:
+            for record in read_records(path, start, end, win_tile, stats.add_error):
+                try:
+                    stats.add(record)
+                except ValueError as error:
+                    stats.add_error(f'{path}: {error}')
+        except OSError as error:
+            stats.add_error(f'{path}: {error}')
+
+    return stats
+
+def make_shards(paths: list[str],
+                shard_count: int,
+                shard_bytes: int=64 * 1024 * 1024) -> list[list[tuple]]:
+    """
+    Splits the files into shard_count lists of (path, start, end) of about the same number of bytes
+
+    json-lines files bigger than shard_bytes are split into byte ranges, replays are never split
+    """
+
+    pieces = []
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            # reading it fails in the shard, where it is counted as an error
+            size = 0
+        if path.endswith('.2048r') or size <= shard_bytes:
+            pieces.append((size, (path, 0, None)))
+        else:
+            for start in range(0, size, shard_bytes):
+                pieces.append((min(shard_bytes, size - start), (path, start, start + shard_bytes)))
+
+    # biggest first onto the shard with the fewest bytes so far
+    shards = [[0, []] for i in range(max(1, shard_count))]
+    for size, piece in sorted(pieces, key=lambda piece: -piece[0]):
+        shard = min(shards, key=lambda shard: shard[0])
+        shard[0] += size
+        shard[1].append(piece)
+
+    return [pieces for size, pieces in shards if pieces]
+
+def collect(paths: list[str],
+            workers: int or None=None,
+            win_tile: int=WIN_TILE) -> GameStats:
+    'Reads all records of the files across a process pool and merges the stats'
+
+    workers = workers or os.cpu_count() or 1
+    # a few shards per worker so a slow one does not leave the other cores idle
+    shards = make_shards(paths, workers * 4 if workers > 1 else 1)
+
+    stats = GameStats(win_tile)
+    if workers == 1:
+        for shard in shards:
+            stats.merge(_collect_shard(shard, win_tile))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            for shard_stats in executor.map(_collect_shard, shards, [win_tile] * len(shards)):
+                stats.merge(shard_stats)
+
+    return stats
+
+def _print_summary(summary: dict,
+                   seconds: float) -> None:
+
+    print(f'{summary["games"]} games in {seconds:.2f}s ({summary["games"] / seconds if seconds else 0:.0f} games/s)')
+    print(f'highscore {summary["highscore"]}, tile highscore {summary["tile_highscore"]}')
+    for name in ('score', 'moves', 'moves_to_win'):
+        print(f'{name}: ' + ', '.join(f'{key} {value:.0f}' for key, value in summary[name].items()
+                                      if value is not None))
+    print(f'won: {summary["won"]}')
+    if summary['errors']:
+        print(f'{summary["errors"]} records could not be read and were left out, the last one: {summary["last_error"]}')
+    print('max tile:')
+    for tile, count in summary['max_tiles'].items():
+        print(f' - {tile:>6}: {count:>10} ({count / summary["games"]:6.2%})')
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m modules.stats',
+                                     description='Adds up archived games from json-lines files and replays.')
+    parser.add_argument('paths', nargs='+', metavar='FILE', help='.jsonl files and .2048r replays')
+    parser.add_argument('--workers', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--win-tile', type=int, default=WIN_TILE)
+    parser.add_argument('--json', action='store_true', help='print the stats as json')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = collect(args.paths, args.workers, args.win_tile).summary()
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(summary, indent=4))
+    elif summary['games']:
+        _print_summary(summary, elapsed)
+    else:
+        print('no games found.' if not summary['errors'] else
+              f'no games found, {summary["errors"]} records could not be read, the last one: {summary["last_error"]}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""
+Precomputed row move tables for Grid, cached on disk and memory mapped
+
+A move pushes every line of the grid towards its start, and what happens to a line
+only depends on its tiles. Storing each tile as a bits wide exponent makes a line one
+number, so every possible line of a length can be moved once ahead of time:
+
+    header: b'2048T', version, length, bits, then 0 bytes up to 8 bytes
+    results: 2**(length * bits) uint32, the moved line (same packing as the index)
+             | the number of merges << 24, or UNSUPPORTED
+    scores: 2**(length * bits) uint32, the score the move gains
+
+Cell i of a line is bits i * bits to i * bits + bits - 1, the start of the line is cell 0.
+A line that would merge into a tile too big for bits is UNSUPPORTED and is moved by the loop
+in Grid like lines with bigger tiles or lines too long for a table
+
+The files are kept in __pycache__/ next to this module (or CACHE_DIR) and only mapped by
+later starts. Grid builds the 4 cell table (40ms, 512KiB) the first time it needs it, the
+5 cell one (about a second, 8MiB) is only used once it has been built with the command below
+
+usage: python -m modules.tables build [LENGTH...] [--cache-dir DIR]
+       python -m modules.tables info
+"""
+
+import argparse
+import array
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'2048T'
+VERSION = 1
+
+MIN_LENGTH = 4
+# 2**20 lines take 8MiB and about a second to build, longer lines get fewer bits per cell
+MAX_INDEX_BITS = 20
+MAX_BITS = 4
+# with fewer bits only the smallest tiles fit and the loop moves nearly every line anyway
+MIN_BITS = 4
+
+UNSUPPORTED = 0xFFFFFFFF
+MERGES_SHIFT = 24
+
+# lines a RowTable keeps decoded into numbers before it starts over
+MAX_DECODED = 1 << 16
+
+# the lengths get_table() builds when their file is missing, the others need to be built ahead of time
+BUILD_LENGTHS = (4,)
+# where get_table() keeps the files, None for __pycache__/ next to this module
+CACHE_DIR = None
+
+_HEADER = struct.Struct('<5sBBBxxxxxxxx')
+
+# (length, cache dir) -> RowTable, shared by all grids
+_tables = {}
+
+def table_bits(length: int) -> int or None:
+    'The bits per cell of the table for lines of length, None if there is no table for it'
+
+    # the loop in Grid moves lines this short about as fast as a lookup
+    if length < MIN_LENGTH:
+        return None
+
+    bits = min(MAX_BITS, MAX_INDEX_BITS // length)
+
+    return bits if bits >= MIN_BITS else None
+
+def default_cache_dir() -> str:
+
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+def table_path(length: int,
+               bits: int,
+               cache_dir: str or None=None) -> str:
+
+    return os.path.join(cache_dir or default_cache_dir(), f'rows-{length}x{bits}.table')
+
+def build_table(length: int,
+                bits: int) -> tuple[array.array]:
+    'Moves every line of length cells of bits each, returns (results, scores)'
+
+    mask = (1 << bits) - 1
+    max_exponent = mask
+    count = 1 << (length * bits)
+
+    results = array.array('I', bytes(4 * count))
+    scores = array.array('I', bytes(4 * count))
+
+    for index in range(count):
+        tiles = [(index >> (bits * i)) & mask for i in range(length)]
+        tiles = [tile for tile in tiles if tile]
+
+        result = 0
+        score = 0
+        merges = 0
+        shift = 0
+        dex = 0
+        while dex < len(tiles):
+            tile = tiles[dex]
+            if dex + 1 < len(tiles) and tiles[dex + 1] == tile:
+                if tile == max_exponent:
+                    break
+                tile += 1
+                score += 1 << tile
+                merges += 1
+                dex += 2
+            else:
+                dex += 1
+            result |= tile << shift
+            shift += bits
+        else:
+            results[index] = result | merges << MERGES_SHIFT
+            scores[index] = score
+            continue
+
+        results[index] = UNSUPPORTED
+
+    return results, scores
+
+def _write_table(path: str,
+                 length: int,
+                 bits: int,
+                 results: array.array,
+                 scores: array.array) -> None:
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as table_file:
+        table_file.write(_HEADER.pack(MAGIC, VERSION, length, bits))
+        results.tofile(table_file)
+        scores.tofile(table_file)
+    os.replace(temp_path, path)
+
+class RowTable(object):
+    """
+    The moves of every line of one length, memory mapped from the cache file
+
+    params:
+        length: the cells in a line
+        cache_dir: where the table file is kept, defaults to __pycache__/ next to this module
+        build: build and write the file when it is missing instead of raising FileNotFoundError
+    """
+
+    __slots__ = ('length', 'bits', 'mask', 'exponents', 'numbers', 'results', 'scores',
+                 'path', 'build_seconds', '_decoded', '_file', '_map')
+
+    def __init__(self: object,
+                 length: int,
+                 cache_dir: str or None=None,
+                 build: bool=True) -> None:
+
+        bits = table_bits(length)
+        if bits is None:
+            raise ValueError(f'there is no table for lines of {length} cells.')
+
+        self.length = length
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        # only powers of 2 that fit in bits, every other number makes Grid use its loop
+        self.exponents = {0: 0}
+        self.exponents.update({2**exponent: exponent for exponent in range(1, self.mask + 1)})
+        self.numbers = tuple(2**exponent if exponent else 0 for exponent in range(self.mask + 1))
+
+        self.path = table_path(length, bits, cache_dir)
+        self.build_seconds = None
+        # line numbers -> move_line(), so a line seen before costs one dict lookup
+        self._decoded = {}
+        self._file = None
+        self._map = None
+
+        count = 1 << (length * bits)
+        if not self._load(count):
+            if not build:
+                raise FileNotFoundError(f'{self.path} has not been built, see python -m modules.tables build.')
+            start = time.perf_counter()
+            results, scores = build_table(length, bits)
+            self.build_seconds = time.perf_counter() - start
+            # a cache that can't be written only costs the next start the build again
+            try:
+                _write_table(self.path, length, bits, results, scores)
+            except OSError:
+                pass
+            if not self._load(count):
+                self.results, self.scores = results, scores
+
+    def _load(self: object,
+              count: int) -> bool:
+
+        try:
+            table_file = open(self.path, 'rb')
+        except OSError:
+            return False
+
+        try:
+            if os.fstat(table_file.fileno()).st_size != _HEADER.size + 8 * count:
+                raise ValueError
+            table_map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if _HEADER.unpack_from(table_map) != (MAGIC, VERSION, self.length, self.bits):
+                table_map.close()
+                raise ValueError
+        except (OSError, ValueError):
+            table_file.close()
+            return False
+
+        self._file = table_file
+        self._map = table_map
+        view = memoryview(table_map)
+        self.results = view[_HEADER.size:_HEADER.size + 4 * count].cast('I')
+        self.scores = view[_HEADER.size + 4 * count:].cast('I')
+
+        return True
+
+    def move_line(self: object,
+                  line: tuple[int]) -> tuple or None:
+        """
+        Moves a line of numbers towards its start
+
+        returns (the numbers after the move or None if nothing moved, score, merges),
+        None if the line has a number the table can't hold
+        """
+
+        try:
+            return self._decoded[line]
+        except KeyError:
+            pass
+
+        if len(self._decoded) >= MAX_DECODED:
+            self._decoded.clear()
+
+        exponents = self.exponents
+        bits = self.bits
+        index = 0
+        try:
+            for item in reversed(line):
+                index = index << bits | exponents[item]
+        except KeyError:
+            self._decoded[line] = None
+            return None
+
+        result = self.results[index]
+        if result == UNSUPPORTED:
+            moved = None
+        elif result == index:
+            moved = (None, 0, 0)
+        else:
+            numbers = self.numbers
+            mask = self.mask
+            moved = (tuple(numbers[(result >> (bits * i)) & mask] for i in range(self.length)),
+                     self.scores[index], result >> MERGES_SHIFT)
+
+        self._decoded[line] = moved
+
+        return moved
+
+    @property
+    def size(self: object) -> int:
+        'Bytes of the table'
+
+        return 8 * len(self.results)
+
+    def close(self: object) -> None:
+
+        if self._map is not None:
+            self.results.release()
+            self.scores.release()
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+def get_table(length: int) -> RowTable or None:
+    """
+    The table for lines of length from CACHE_DIR, loaded once and built if length is in BUILD_LENGTHS
+
+    returns None if lines that long have no table or it has not been built
+    """
+
+    key = (length, CACHE_DIR)
+    if key not in _tables:
+        table = None
+        if table_bits(length) is not None:
+            try:
+                table = RowTable(length, CACHE_DIR, length in BUILD_LENGTHS)
+            except FileNotFoundError:
+                pass
+        _tables[key] = table
+
+    return _tables[key]
+
+def main(argv: list[str] or None=None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m modules.tables',
+                                     description='Builds and lists the row move tables Grid uses.')
+    parser.add_argument('command', choices=('build', 'info'))
+    parser.add_argument('lengths', nargs='*', type=int, metavar='LENGTH',
+                        help='line lengths to build, defaults to every length with a table')
+    parser.add_argument('--cache-dir', default=None, help='defaults to __pycache__/ next to this module')
+    args = parser.parse_args(argv)
+
+    lengths = args.lengths or [length for length in range(2, MAX_INDEX_BITS + 1) if table_bits(length)]
+
+    for length in lengths:
+        bits = table_bits(length)
+        if bits is None:
+            print(f'{length}: no table, Grid moves lines of this length with its loop')
+            continue
+
+        path = table_path(length, bits, args.cache_dir)
+        if args.command == 'build':
+            if os.path.exists(path):
+                os.remove(path)
+            table = RowTable(length, args.cache_dir)
+            print(f'{length}: built in {table.build_seconds:.2f}s, {table.size / 1024:.0f}KiB, '
+                  f'tiles up to {2**table.mask} -> {path}')
+            table.close()
+        elif os.path.exists(path):
+            print(f'{length}: {os.path.getsize(path) / 1024:.0f}KiB, tiles up to {2**((1 << bits) - 1)} -> {path}')
+        else:
+            print(f'{length}: not built yet')
+
+
+if __name__ == '__main__':
+    main()
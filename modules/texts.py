@@ -0,0 +1,77 @@
+import json
+import os
+import pickle
+
+# the type every key of texts.json needs to have
+TYPES = {'win': list,
+         'empty_tile': str,
+         'score': str,
+         'highscore': str,
+         'tile_highscore': str,
+         'death': str,
+         'info': str,
+         'stats': str,
+         'hint': str,
+         'autoplay': str}
+
+# part of the cache key with TYPES, bump it when check_texts() checks anything else
+CACHE_VERSION = 1
+
+def check_texts(texts: dict) -> None:
+
+    # type checking for texts.json
+    for key, value in texts.items():
+        value_type = type(value)
+        if value_type != TYPES[key]:
+            if TYPES[key] == list:
+                raise ValueError(f'value for "{key}" in text.json should ' \
+                                 f'be a list of str lines, not {TYPES[key]}')
+            else:
+                raise ValueError(f'value for "{key}" in text.json should ' \
+                                 f'be of type {TYPES[key]}, not {value_type}')
+
+def load_texts(path: str='texts.json',
+               cache_path: str or None=None) -> dict:
+    """
+    Loads and checks texts.json, through a pickled cache of the checked texts
+
+    The cache is only used while texts.json has the same modification time and size
+    and TYPES and CACHE_VERSION are the same as when the cache was written, any change
+    to the file or to the checks checks it again
+
+    params:
+        path: the texts file
+        cache_path: where the cache is kept, defaults to __pycache__/ next to the texts file
+    """
+
+    stat = os.stat(path)
+    key = (CACHE_VERSION, tuple((name, value_type.__name__) for name, value_type in TYPES.items()),
+           stat.st_mtime_ns, stat.st_size)
+
+    if cache_path is None:
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(path)), '__pycache__',
+                                  os.path.basename(path) + '.pickle')
+
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached_key, texts = pickle.load(cache_file)
+        if cached_key == key:
+            return texts
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(path, 'r', encoding='UTF-8') as texts_file:
+        texts = json.load(texts_file)
+    check_texts(texts)
+
+    # a cache that can't be written only costs the next launch the check again
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((key, texts), cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+    return texts
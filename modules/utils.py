@@ -22,4 +22,3 @@ def addstr_robust(stdscr: curses.window,
 
     except curses.error:
         pass
-
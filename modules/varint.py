@@ -0,0 +1,42 @@
+"""
+Unsigned LEB128 varints, as replays and the undo history store their numbers
+
+Every byte holds 7 bits of the number, lowest first, and has its top bit set
+when another byte follows, so numbers below 128 take one byte
+"""
+
+# a 64 bit number takes at most this many bytes
+MAX_SIZE = 10
+
+def encode(value: int) -> bytes:
+
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+def decode(data: bytes,
+           dex: int=0) -> tuple[int]:
+    """
+    Reads the varint starting at data[dex]
+
+    returns (value, index after it), raises ValueError if data ends in the middle of it
+    """
+
+    value = 0
+    shift = 0
+    try:
+        while True:
+            byte = data[dex]
+            dex += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value, dex
+            shift += 7
+    except IndexError:
+        raise ValueError('data ends in the middle of a number.') from None